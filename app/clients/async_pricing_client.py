@@ -0,0 +1,176 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+
+import aiohttp # type: ignore
+
+from .pricing_client import PricingClient, PRICING_URL
+from .resilience import CircuitOpenError, backoff_delay
+from .single_flight import price_flight
+
+
+class AsyncPricingClient(PricingClient):
+    # Mesma interface do PricingClient, mas todas as cotações de um lote saem
+    # juntas em um único event loop, limitadas por max_concurrency e pelo
+    # ProviderGuard de cada provedor (taxa adaptativa, retries e circuit breaker).
+    def __init__(self, base_url=PRICING_URL, max_concurrency=64, timeout=15, keepalive_timeout=30, cache=None, bulk=False, history=None,
+                 max_retries=3, requests_per_second=None):
+        super().__init__(base_url=base_url, timeout=timeout, cache=cache, bulk=bulk, history=history,
+                         max_retries=max_retries, requests_per_second=requests_per_second)
+        self.max_concurrency = max_concurrency
+        self.keepalive_timeout = keepalive_timeout
+
+        self._loop = None
+        self._loop_thread = None
+        self._http = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+        logging.info(f"AsyncPricingClient inicializado (concorrência máxima: {max_concurrency}).")
+
+    def _fetch_many(self, all_data):
+        loop = self._ensure_loop()
+        future_to_item = {
+            asyncio.run_coroutine_threadsafe(self._fetch_one(item), loop): item
+            for item in all_data
+        }
+        try:
+            for future in concurrent.futures.as_completed(future_to_item):
+                item = future_to_item[future]
+                try:
+                    yield item, future.result()
+                except Exception as exc:
+                    yield item, exc
+        finally:
+            for future in future_to_item:
+                future.cancel()
+
+    def close(self):
+        super().close()
+        with self._lock:
+            if self._loop is None:
+                return
+
+            if self._http is not None:
+                asyncio.run_coroutine_threadsafe(self._http.close(), self._loop).result()
+                self._http = None
+
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+            self._loop.close()
+            self._loop = None
+            self._loop_thread = None
+
+    def _ensure_loop(self):
+        # O loop vive em uma thread própria para que a sessão HTTP (e suas
+        # conexões keep-alive) seja reaproveitada entre chamadas e threads.
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="AsyncPricingClient-loop",
+                    daemon=True
+                )
+                self._loop_thread.start()
+            return self._loop
+
+    async def _get_http(self):
+        if self._http is None or self._http.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            self._http = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trust_env=False
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._http
+
+    async def _fetch_one(self, item):
+        http = await self._get_http()
+        return await self._fetch_single_price_async(http, item)
+
+    async def _fetch_single_price_async(self, http, item):
+        # Mesma chave do _fetch_single_price: cotações idênticas em voo, de
+        # qualquer um dos clientes, compartilham a requisição.
+        key = (self.base_url, item["provider"], item["instance_type"], item["region"], item.get("market", "spot"))
+        return await price_flight.do_async(key, self._request_single_price_async, http, item)
+
+    async def _request_single_price_async(self, http, item):
+        provider = item["provider"]
+        instance_type = item["instance_type"]
+
+        try:
+            data = await self._get_json_async(http, provider, self._build_params(item))
+            return self._parse_prices(item, data.get('prices_spot'))
+
+        except aiohttp.ClientResponseError as e:
+            logging.warning(f"Falha ao buscar preço para {provider}/{instance_type}. Status: {e.status}")
+            return None, None, ()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.error(f"Erro de conexão ao buscar preço para {provider}/{instance_type}: {e!r}")
+            return None, None, ()
+        except CircuitOpenError as e:
+            logging.warning(f"Preço para {provider}/{instance_type} não cotado: {e}")
+            return None, None, ()
+
+    async def _get_json_async(self, http, provider, params):
+        # Equivalente assíncrono do _get_json, com o mesmo ProviderGuard por
+        # provedor: a espera por token e o backoff usam asyncio.sleep em vez de
+        # bloquear o event loop.
+        guard = self._guard_for(provider)
+        attempt = 0
+
+        while True:
+            if not guard.breaker.allow():
+                raise CircuitOpenError(provider)
+
+            wait = guard.limiter.try_acquire()
+            while wait:
+                await asyncio.sleep(wait)
+                wait = guard.limiter.try_acquire()
+            guard.budget.record_request()
+            try:
+                async with self._semaphore:
+                    async with http.get(self.base_url, params=params) as response:
+                        if response.status == 429 or response.status >= 500:
+                            guard.limiter.on_throttle()
+                        response.raise_for_status()
+                        data = await response.json(content_type=None)
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                retryable = self._is_retryable_async(e)
+                if retryable:
+                    guard.breaker.record_failure()
+                else:
+                    guard.breaker.record_success()
+
+                if not retryable or attempt >= self.max_retries or not guard.budget.try_spend():
+                    raise
+
+                await asyncio.sleep(self._retry_delay_async(attempt, e))
+                attempt += 1
+                continue
+
+            guard.limiter.on_success()
+            guard.breaker.record_success()
+            return data
+
+    @staticmethod
+    def _is_retryable_async(error):
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status == 429 or error.status >= 500
+        return isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+    @staticmethod
+    def _retry_delay_async(attempt, error):
+        delay = backoff_delay(attempt)
+        headers = getattr(error, 'headers', None) or {}
+        retry_after = headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), 5.0))
+        return delay
@@ -0,0 +1,145 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from ..core.models import FleetVmSpec
+
+DEFAULT_FLEET_STATE_PATH = './cache/fleet_state.db'
+
+RUNNING = 'running'
+TERMINATED = 'terminated'
+
+INSTANCE_COLUMNS = ('instance_id', 'fleet_id', 'provider', 'region', 'region_az', 'instance_type', 'price', 'weight', 'public_ip', 'private_ip', 'state')
+
+
+class FleetStateStore:
+    # Estado local das frotas e instâncias provisionadas, em SQLite com WAL:
+    # sobrevive a uma queda do processo e permite desmontar e contabilizar a
+    # frota pelos índices (provedor, região, AZ, tipo, estado) em vez de
+    # listar os recursos na nuvem.
+    def __init__(self, path=DEFAULT_FLEET_STATE_PATH):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS fleets (
+                fleet_id TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                region TEXT NOT NULL,
+                state TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS instances (
+                instance_id TEXT PRIMARY KEY,
+                fleet_id TEXT NOT NULL,
+                provider TEXT NOT NULL,
+                region TEXT NOT NULL,
+                region_az TEXT NOT NULL,
+                instance_type TEXT NOT NULL,
+                price REAL NOT NULL,
+                weight REAL NOT NULL,
+                public_ip TEXT,
+                private_ip TEXT,
+                state TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS instances_by_location ON instances (provider, region, region_az, state);
+            CREATE INDEX IF NOT EXISTS instances_by_az ON instances (region_az, state);
+            CREATE INDEX IF NOT EXISTS instances_by_type ON instances (instance_type, state);
+            CREATE INDEX IF NOT EXISTS instances_by_state ON instances (state, provider);
+            CREATE INDEX IF NOT EXISTS instances_by_fleet ON instances (fleet_id);
+            CREATE INDEX IF NOT EXISTS fleets_by_state ON fleets (state, provider);
+            """
+        )
+        self._conn.commit()
+        logging.info(f"FleetStateStore aberto em '{path}'.")
+
+    def record_fleet(self, fleet_id, vms, state=RUNNING):
+        # Inserção em lote de uma frota recém-provisionada, em uma única transação.
+        if not vms:
+            return
+        now = time.time()
+        rows = [
+            (vm.instance_id, fleet_id, vm.provider, vm.region, vm.region_az, vm.instance_type,
+             vm.price, vm.weight, vm.public_ip, vm.private_ip, state, now, now)
+            for vm in vms
+        ]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO fleets (fleet_id, provider, region, state, created_at, updated_at) VALUES (?, ?, ?, 'active', ?, ?) "
+                "ON CONFLICT(fleet_id) DO UPDATE SET state = 'active', updated_at = excluded.updated_at",
+                (fleet_id, vms[0].provider, vms[0].region, now, now)
+            )
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO instances ({', '.join(INSTANCE_COLUMNS)}, created_at, updated_at) "
+                f"VALUES ({', '.join('?' * (len(INSTANCE_COLUMNS) + 2))})",
+                rows
+            )
+
+    def mark_instances(self, instance_ids, state):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE instances SET state = ?, updated_at = ? WHERE instance_id = ?",
+                [(state, now, instance_id) for instance_id in instance_ids]
+            )
+
+    def mark_fleets(self, fleet_ids, state):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE fleets SET state = ?, updated_at = ? WHERE fleet_id = ?",
+                [(state, now, fleet_id) for fleet_id in fleet_ids]
+            )
+
+    def instances(self, provider=None, region=None, region_az=None, instance_type=None, state=None, fleet_id=None):
+        # Ex.: instances(region_az='sa-east-1a', state='running').
+        clauses, params = self._where(provider=provider, region=region, region_az=region_az, instance_type=instance_type, state=state, fleet_id=fleet_id)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(INSTANCE_COLUMNS)} FROM instances{clauses}", params).fetchall()
+        return [
+            FleetVmSpec(
+                provider=provider_name, instance_type=type_name, instance_id=instance_id, region_az=az,
+                price=price, public_ip=public_ip, private_ip=private_ip, weight=weight, region=region_name
+            )
+            for instance_id, _, provider_name, region_name, az, type_name, price, weight, public_ip, private_ip, _ in rows
+        ]
+
+    def fleets(self, provider=None, state='active'):
+        clauses, params = self._where(provider=provider, state=state)
+        with self._lock:
+            return self._conn.execute(f"SELECT fleet_id, provider, region FROM fleets{clauses} ORDER BY created_at", params).fetchall()
+
+    def accounting(self, state=RUNNING):
+        # Instâncias, unidades de capacidade e custo/h por (provedor, região).
+        clauses, params = self._where(state=state)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT provider, region, COUNT(*), SUM(weight), SUM(price) FROM instances{clauses} GROUP BY provider, region ORDER BY provider, region",
+                params
+            ).fetchall()
+        return [
+            {"provider": provider, "region": region, "instances": count, "capacity": capacity, "hourly_cost": round(cost, 6)}
+            for provider, region, count, capacity, cost in rows
+        ]
+
+    @staticmethod
+    def _where(**filters):
+        filters = {column: value for column, value in filters.items() if value is not None}
+        if not filters:
+            return "", ()
+        return " WHERE " + " AND ".join(f"{column} = ?" for column in filters), tuple(filters.values())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,94 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_FULFILLMENT_STATS_PATH = './cache/fulfillment_stats.db'
+
+COUNTERS = ('attempts', 'fulfilled', 'requested', 'delivered', 'capacity_errors')
+
+
+class FulfillmentStats:
+    # Histórico de atendimento dos create_fleet por (provedor, região, AZ, tipo),
+    # em SQLite com WAL. attempts/fulfilled somam observações de atendimento
+    # (0 a 1), comparáveis entre unidades de capacidade; requested/delivered
+    # guardam as unidades pedidas ao grupo e entregues pela chave. Todos os
+    # contadores decaem com meia-vida half_life_hours: falta de capacidade
+    # antiga pesa menos que a de hoje.
+    def __init__(self, path=DEFAULT_FULFILLMENT_STATS_PATH, half_life_hours=24):
+        self.path = path
+        self.half_life = half_life_hours * 3600
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS fulfillment (
+                provider TEXT NOT NULL,
+                region TEXT NOT NULL,
+                region_az TEXT NOT NULL,
+                instance_type TEXT NOT NULL,
+                attempts REAL NOT NULL,
+                fulfilled REAL NOT NULL,
+                requested REAL NOT NULL,
+                delivered REAL NOT NULL,
+                capacity_errors REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (provider, region, region_az, instance_type)
+            )
+            """
+        )
+        self._conn.commit()
+        logging.info(f"FulfillmentStats aberto em '{path}'.")
+
+    def _decay(self, age):
+        return 0.5 ** (max(0.0, age) / self.half_life)
+
+    def record(self, observations, timestamp=None):
+        # observations: [((provedor, região, AZ, tipo), atendimento de 0 a 1,
+        # unidades pedidas, unidades entregues, erro de capacidade)], em uma transação.
+        if not observations:
+            return
+        now = time.time() if timestamp is None else timestamp
+        with self._lock, self._conn:
+            for key, fraction, requested, delivered, capacity_error in observations:
+                row = self._conn.execute(
+                    f"SELECT {', '.join(COUNTERS)}, updated_at FROM fulfillment "
+                    "WHERE provider = ? AND region = ? AND region_az = ? AND instance_type = ?",
+                    key
+                ).fetchone()
+                factor = self._decay(now - row[-1]) if row else 0.0
+                previous = row[:-1] if row else (0.0,) * len(COUNTERS)
+                values = [
+                    value * factor + delta
+                    for value, delta in zip(previous, (1.0, fraction, requested, delivered, 1.0 if capacity_error else 0.0))
+                ]
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO fulfillment (provider, region, region_az, instance_type, {', '.join(COUNTERS)}, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (*key, *values, max(now, row[-1]) if row else now)
+                )
+
+    def rows(self, provider=None):
+        # {(provedor, região, AZ, tipo): {contador: valor}}, com o decaimento aplicado até agora.
+        query = f"SELECT provider, region, region_az, instance_type, {', '.join(COUNTERS)}, updated_at FROM fulfillment"
+        params = ()
+        if provider is not None:
+            query += " WHERE provider = ?"
+            params = (provider,)
+        now = time.time()
+        with self._lock:
+            result = self._conn.execute(query, params).fetchall()
+        return {
+            tuple(row[:4]): {name: value * self._decay(now - row[-1]) for name, value in zip(COUNTERS, row[4:-1])}
+            for row in result
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
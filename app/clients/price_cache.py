@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = './cache/price_cache.db'
+
+
+class PriceCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=300, max_stale_seconds=3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max_stale_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS spot_prices (
+                provider TEXT NOT NULL,
+                instance_type TEXT NOT NULL,
+                region TEXT NOT NULL,
+                market TEXT NOT NULL,
+                price REAL NOT NULL,
+                region_az TEXT,
+                fetched_at REAL NOT NULL,
+                az_prices TEXT NOT NULL DEFAULT '[]',
+                PRIMARY KEY (provider, instance_type, region, market)
+            )
+            """
+        )
+        self._conn.commit()
+        logging.info(f"PriceCache aberto em '{path}' (TTL: {ttl_seconds}s, stale máximo: {max_stale_seconds}s).")
+
+    @staticmethod
+    def key_for(item):
+        return (item["provider"], item["instance_type"], item["region"], item.get("market", "spot"))
+
+    def get(self, key):
+        # Retorna ((price, region_az, az_prices), is_stale) ou None. Entradas além do
+        # TTL ainda são servidas até max_stale_seconds; depois disso contam como miss.
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT price, region_az, az_prices, fetched_at FROM spot_prices "
+                "WHERE provider = ? AND instance_type = ? AND region = ? AND market = ?",
+                key
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            price, region_az, az_prices, fetched_at = row
+            result = (price, region_az, tuple((az, az_price) for az, az_price in json.loads(az_prices)))
+            age = time.time() - fetched_at
+
+            if age <= self.ttl_seconds:
+                self.hits += 1
+                return result, False
+            if age <= self.max_stale_seconds:
+                self.stale_hits += 1
+                return result, True
+
+            self.misses += 1
+            return None
+
+    def set(self, key, price, region_az, az_prices=()):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO spot_prices "
+                "(provider, instance_type, region, market, price, region_az, fetched_at, az_prices) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (*key, price, region_az, time.time(), json.dumps(az_prices))
+            )
+            self._conn.commit()
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
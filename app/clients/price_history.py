@@ -0,0 +1,109 @@
+import logging
+import math
+import mmap
+import os
+import statistics
+import struct
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from urllib.parse import quote
+
+DEFAULT_HISTORY_DIR = './cache/price_history'
+
+# Cada cotação ocupa 16 bytes: (timestamp, preço) em float64 little-endian.
+# Um único write por registro mantém o append atômico entre processos; a
+# leitura mapeia o arquivo e separa as colunas com views de passo 2.
+RECORD = struct.Struct('<dd')
+
+
+class PriceHistory:
+    def __init__(self, root=DEFAULT_HISTORY_DIR, max_open_files=256):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        # Arquivos de append abertos por chave (LRU), para não pagar um
+        # open/close por cotação; sem buffer, cada write ainda é um append atômico.
+        self.max_open_files = max_open_files
+        self._handles = OrderedDict()
+        logging.info(f"PriceHistory aberto em '{root}'.")
+
+    def _path_for(self, provider, region, region_az, instance_type):
+        name = '__'.join(quote(part, safe='') for part in (provider, region, region_az, instance_type))
+        return os.path.join(self.root, f'{name}.bin')
+
+    def append(self, provider, region, region_az, instance_type, price, timestamp=None):
+        self.append_many([(provider, region, region_az, instance_type, price)], timestamp)
+
+    def append_many(self, quotes, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        records = defaultdict(bytearray)
+        for provider, region, region_az, instance_type, price in quotes:
+            records[self._path_for(provider, region, region_az, instance_type)] += RECORD.pack(timestamp, float(price))
+        with self._lock:
+            for path, data in records.items():
+                self._handle_for(path).write(data)
+
+    def _handle_for(self, path):
+        handle = self._handles.get(path)
+        if handle is not None:
+            self._handles.move_to_end(path)
+            return handle
+        if len(self._handles) >= self.max_open_files:
+            _, oldest = self._handles.popitem(last=False)
+            oldest.close()
+        handle = self._handles[path] = open(path, 'ab', buffering=0)
+        return handle
+
+    def close(self):
+        with self._lock:
+            for handle in self._handles.values():
+                handle.close()
+            self._handles.clear()
+
+    def _columns(self, provider, region, region_az, instance_type, n=None):
+        # Lê apenas as n cotações mais recentes (ou todas, se n for None).
+        path = self._path_for(provider, region, region_az, instance_type)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return [], []
+
+        # Ignora um eventual registro parcial no fim do arquivo.
+        size -= size % RECORD.size
+        if size == 0:
+            return [], []
+        start = max(0, size - n * RECORD.size) if n is not None else 0
+
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                values = memoryview(mapped)[start:size].cast('d')
+                try:
+                    return values[0::2].tolist(), values[1::2].tolist()
+                finally:
+                    values.release()
+
+    def last(self, provider, region, region_az, instance_type, n=10):
+        timestamps, prices = self._columns(provider, region, region_az, instance_type, n)
+        return list(zip(timestamps, prices))
+
+    def rolling_min(self, provider, region, region_az, instance_type, window=20):
+        _, prices = self._columns(provider, region, region_az, instance_type, window)
+        return min(prices) if prices else None
+
+    def rolling_median(self, provider, region, region_az, instance_type, window=20):
+        _, prices = self._columns(provider, region, region_az, instance_type, window)
+        return statistics.median(prices) if prices else None
+
+    def volatility(self, provider, region, region_az, instance_type, window=20):
+        # Desvio padrão dos log-retornos entre cotações consecutivas.
+        _, prices = self._columns(provider, region, region_az, instance_type, window)
+        prices = [price for price in prices if price > 0]
+        if len(prices) < 3:
+            return None
+        returns = [math.log(current / previous) for previous, current in zip(prices, prices[1:])]
+        return statistics.stdev(returns)
+
+    def expected_price(self, vm, window=20):
+        median = self.rolling_median(vm.provider, vm.region, vm.region_az, vm.instance_type, window)
+        return median if median is not None else vm.price
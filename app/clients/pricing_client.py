@@ -1,66 +1,369 @@
+import itertools
 import logging
+import threading
+import time
 import requests # type: ignore
 import concurrent.futures
+from collections import defaultdict
 from ..core.models import VMSpec
+from ..core.tracing import tracer
+from .single_flight import price_flight
+from .resilience import CircuitOpenError, ProviderGuard, backoff_delay
+
+PRICING_URL = "url"
 
 
 class PricingClient:
-    def __init__(self):
+    def __init__(self, base_url=PRICING_URL, max_workers=5, timeout=15, cache=None, bulk=False, bulk_page_size=500,
+                 max_retries=3, requests_per_second=None, history=None):
+        self.base_url = base_url
+        self.history = history
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.requests_per_second = requests_per_second
+        self._guards = {}
+        self._guards_lock = threading.Lock()
+        self.cache = cache
+        self.bulk = bulk
+        self.bulk_page_size = bulk_page_size
+        self._refresh_executor = None
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
         self.session = requests.Session()
         self.session.trust_env = False
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         logging.info("PricingClient inicializado com sessão configurada.")
 
+    def close(self):
+        # Espera a atualização em segundo plano do cache terminar antes de quem
+        # chamou fechar o PriceCache.
+        with self._refresh_lock:
+            refresh_executor, self._refresh_executor = self._refresh_executor, None
+        if refresh_executor is not None:
+            refresh_executor.shutdown(wait=True)
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        self.session.close()
+
     def get_prices_for(self, all_data):
         logging.info(f"PricingClient: Recebi {len(all_data)} itens para cotar em paralelo.")
-        vms_with_prices = []
+        return list(self.iter_prices_for(all_data))
+
+    def iter_prices_for(self, all_data):
+        # Entrega cada VMSpec assim que o preço chega, sem esperar o lote inteiro.
+        priced_count = 0
+        unpriced = []
+        start_time = time.time()
+
+        for item, result in self._quote_all(all_data):
+            if isinstance(result, Exception):
+                logging.error(f"Exceção gerada para o item {item['instance_type']}: {result}")
+                unpriced.append(item)
+                continue
+
+            price, az, az_prices = result
+            if price is None:
+                unpriced.append(item)
+            else:
+                priced_count += 1
+                yield VMSpec(
+                    provider=item["provider"],
+                    instance_type=item["instance_type"],
+                    region=item["region"],
+                    price=price,
+                    region_az=az,
+                    az_prices=az_prices,
+                    vcpus=item.get("vcpus", 0),
+                    ram=item.get("ram", 0)
+                )
+
+        logging.info(f"Cotação finalizada em {time.time() - start_time:.2f}s. {priced_count} VMs com preços válidos.")
+        if unpriced:
+            logging.warning(
+                f"{len(unpriced)} VMs ficaram fora do catálogo por falta de preço: "
+                f"{', '.join(sorted(item['provider'] + '/' + item['instance_type'] for item in unpriced))}"
+            )
+        if self.cache is not None:
+            logging.info(f"PriceCache: {self.cache.stats()}")
+
+    def _quote_all(self, all_data):
+        if self.cache is None:
+            yield from self._fetch(all_data)
+            return
+
+        cached_results = []
+        to_fetch = []
+        to_refresh = []
+
+        for item in all_data:
+            entry = self.cache.get(self.cache.key_for(item))
+            if entry is None:
+                to_fetch.append(item)
+                continue
+
+            result, is_stale = entry
+            cached_results.append((item, result))
+            if is_stale:
+                to_refresh.append(item)
+
+        if to_refresh:
+            self._schedule_refresh(to_refresh)
+
+        yield from itertools.chain(cached_results, self._store_results(self._fetch(to_fetch)))
+
+    def _store_results(self, results):
+        for item, result in results:
+            if not isinstance(result, Exception) and result[0] is not None:
+                self.cache.set(self.cache.key_for(item), *result)
+            yield item, result
+
+    def _schedule_refresh(self, items):
+        # Stale-while-revalidate: o preço antigo já foi servido, a atualização
+        # acontece em segundo plano e só vale para as próximas cotações.
+        with self._refresh_lock:
+            pending = [item for item in items if self.cache.key_for(item) not in self._refreshing]
+            if not pending:
+                return
+            self._refreshing.update(self.cache.key_for(item) for item in pending)
+            if self._refresh_executor is None:
+                self._refresh_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="PriceRefresh")
+
+        logging.info(f"PriceCache: atualizando {len(pending)} preços expirados em segundo plano.")
+        self._refresh_executor.submit(self._refresh, pending)
+
+    def _refresh(self, items):
+        try:
+            for _ in self._store_results(self._fetch(items)):
+                pass
+        except Exception as exc:
+            logging.error(f"PriceCache: falha ao atualizar preços em segundo plano: {exc}")
+        finally:
+            with self._refresh_lock:
+                self._refreshing.difference_update(self.cache.key_for(item) for item in items)
+
+    def _fetch(self, all_data):
+        if self.bulk and all_data:
+            results = self._fetch_bulk(all_data)
+        else:
+            results = self._fetch_many(all_data)
+
+        if self.history is not None:
+            return self._record_history(results)
+        return results
+
+    def _record_history(self, results):
+        for item, result in results:
+            if not isinstance(result, Exception) and result[0] is not None:
+                try:
+                    self.history.append_many(
+                        [(item["provider"], item["region"], az, item["instance_type"], price) for az, price in result[2]]
+                    )
+                except OSError as e:
+                    logging.warning(f"PriceHistory: falha ao registrar cotação de {item['instance_type']}: {e}")
+            yield item, result
+
+    def _fetch_bulk(self, all_data):
+        # Uma cotação paginada por (provedor, região, mercado); apenas os tipos
+        # que não vierem na resposta em lote são cotados individualmente.
+        partitions = defaultdict(list)
+        for item in all_data:
+            partitions[(item["provider"], item["region"], item.get("market", "spot"))].append(item)
+
+        logging.info(f"PricingClient: cotando {len(all_data)} itens em lote ({len(partitions)} regiões).")
+        misses = []
+
+        executor = self._shared_executor()
+        future_to_partition = {
+            executor.submit(tracer.bind(self._fetch_region_prices), *partition): partition
+            for partition in partitions
+        }
+        try:
+            for future in concurrent.futures.as_completed(future_to_partition):
+                partition = future_to_partition[future]
+                try:
+                    region_prices = future.result()
+                except Exception as exc:
+                    logging.error(f"Exceção na cotação em lote de {partition[0]}/{partition[1]}: {exc}")
+                    region_prices = {}
+
+                for item in partitions[partition]:
+                    prices_spot = region_prices.get(item["instance_type"])
+                    if prices_spot:
+                        yield item, self._parse_prices(item, prices_spot)
+                    else:
+                        misses.append(item)
+        finally:
+            for future in future_to_partition:
+                future.cancel()
+
+        if misses:
+            logging.info(f"PricingClient: {len(misses)} itens ausentes na cotação em lote. Cotando individualmente.")
+            yield from self._fetch_many(misses)
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            future_to_item = {executor.submit(self._fetch_single_price, item): item for item in all_data}
+    def _fetch_region_prices(self, provider, region, market):
+        key = ('bulk', self.base_url, provider, region, market)
+        with tracer.span('pricing.region', provider=provider, region=region, market=market) as span:
+            region_prices = price_flight.do(key, self._request_region_prices, provider, region, market)
+            span.set(types=len(region_prices))
+            return region_prices
+
+    def _request_region_prices(self, provider, region, market):
+        params = {'region': region, 'market': market, 'provider': provider, 'page_size': self.bulk_page_size}
+        region_prices = {}
+
+        try:
+            while True:
+                data = self._get_json(provider, params)
+
+                for entry in data.get('prices', []):
+                    if entry.get('prices_spot'):
+                        region_prices[entry['type']] = entry['prices_spot']
+
+                if not data.get('next_page'):
+                    break
+                params['page'] = data['next_page']
+
+        except requests.exceptions.HTTPError as e:
+            logging.warning(f"Falha na cotação em lote para {provider}/{region}. Status: {e.response.status_code}")
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Erro de conexão na cotação em lote para {provider}/{region}: {e}")
+        except CircuitOpenError as e:
+            logging.warning(f"Cotação em lote para {provider}/{region} ignorada: {e}")
+
+        return region_prices
+
+    def _shared_executor(self):
+        # Um único pool para todas as cotações deste cliente: chamadas concorrentes
+        # (ex.: uma por região no CatalogService) dividem o mesmo limite de
+        # max_workers requisições em voo, em vez de cada uma abrir o seu.
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="Pricing")
+            return self._executor
+
+    def _fetch_many(self, all_data):
+        executor = self._shared_executor()
+        fetch = tracer.bind(self._fetch_single_price)
+        future_to_item = {executor.submit(fetch, item): item for item in all_data}
+        try:
             for future in concurrent.futures.as_completed(future_to_item):
                 item = future_to_item[future]
                 try:
-                    price, az = future.result()
-                    
-                    if price is not None:
-                        vms_with_prices.append(
-                            VMSpec(
-                                provider=item["provider"],
-                                instance_type=item["instance_type"],
-                                region=item["region"],
-                                price=price,
-                                region_az=az
-                            )
-                        )
+                    yield item, future.result()
                 except Exception as exc:
-                    logging.error(f"Exceção gerada para o item {item['instance_type']}: {exc}")
-
-        logging.info(f"Cotação finalizada. {len(vms_with_prices)} VMs com preços válidos.")\
-        
-        return vms_with_prices
+                    yield item, exc
+        finally:
+            # Se o consumidor parar de iterar (ex.: top-K já satisfeito), as
+            # cotações que ainda não começaram são canceladas.
+            for future in future_to_item:
+                future.cancel()
 
     def _fetch_single_price(self, item):
+        # Cotações idênticas em voo (ex.: testes pareados da bateria) compartilham a mesma requisição.
+        key = (self.base_url, item["provider"], item["instance_type"], item["region"], item.get("market", "spot"))
+        with tracer.span('pricing.quote', provider=item["provider"], region=item["region"], instance_type=item["instance_type"]) as span:
+            result = price_flight.do(key, self._request_single_price, item)
+            span.set(priced=result[0] is not None)
+            return result
+
+    def _request_single_price(self, item):
         provider = item["provider"]
         instance_type = item["instance_type"]
-        region = item["region"]
-        
-        params = {'type': instance_type, 'region': region, 'market': 'spot', 'provider': provider}
-        
+
         try:
-            response = self.session.get("url", params=params, timeout=15) 
-            response.raise_for_status() 
-            
-            data = response.json()
-            if not data.get('prices_spot'):
-                logging.warning(f"Resposta de preço vazia para {provider}/{instance_type}.")
-                return None, None
-
-            az_min = min(data['prices_spot'], key=data['prices_spot'].get)
-            price_min = data['prices_spot'][az_min]
-            return float(price_min), az_min
-            
+            data = self._get_json(provider, self._build_params(item))
+            return self._parse_prices(item, data.get('prices_spot'))
+
         except requests.exceptions.HTTPError as e:
             logging.warning(f"Falha ao buscar preço para {provider}/{instance_type}. Status: {e.response.status_code}")
-            return None, None
+            return None, None, ()
         except requests.exceptions.RequestException as e:
             logging.error(f"Erro de conexão ao buscar preço para {provider}/{instance_type}: {e}")
-            return None, None
\ No newline at end of file
+            return None, None, ()
+        except CircuitOpenError as e:
+            logging.warning(f"Preço para {provider}/{instance_type} não cotado: {e}")
+            return None, None, ()
+
+    def _get_json(self, provider, params):
+        # GET com limitação de taxa adaptativa, retries com jitter limitados pelo
+        # orçamento do provedor e circuit breaker para falhar rápido.
+        guard = self._guard_for(provider)
+        attempt = 0
+
+        while True:
+            if not guard.breaker.allow():
+                raise CircuitOpenError(provider)
+
+            guard.limiter.acquire()
+            guard.budget.record_request()
+            try:
+                response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+                if response.status_code == 429 or response.status_code >= 500:
+                    guard.limiter.on_throttle()
+                response.raise_for_status()
+
+            except requests.exceptions.RequestException as e:
+                retryable = self._is_retryable(e)
+                if retryable:
+                    guard.breaker.record_failure()
+                else:
+                    guard.breaker.record_success()
+
+                if not retryable or attempt >= self.max_retries or not guard.budget.try_spend():
+                    raise
+
+                time.sleep(self._retry_delay(attempt, e))
+                attempt += 1
+                continue
+
+            guard.limiter.on_success()
+            guard.breaker.record_success()
+            return response.json()
+
+    def _guard_for(self, provider):
+        with self._guards_lock:
+            if provider not in self._guards:
+                self._guards[provider] = ProviderGuard(f"pricing-{provider}", requests_per_second=self.requests_per_second)
+            return self._guards[provider]
+
+    @staticmethod
+    def _is_retryable(error):
+        if isinstance(error, requests.exceptions.HTTPError):
+            status = error.response.status_code
+            return status == 429 or status >= 500
+        return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+    @staticmethod
+    def _retry_delay(attempt, error):
+        delay = backoff_delay(attempt)
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), 5.0))
+        return delay
+
+    @staticmethod
+    def _build_params(item):
+        return {
+            'type': item["instance_type"],
+            'region': item["region"],
+            'market': item.get("market", "spot"),
+            'provider': item["provider"]
+        }
+
+    @staticmethod
+    def _parse_prices(item, prices_spot):
+        if not prices_spot:
+            logging.warning(f"Resposta de preço vazia para {item['provider']}/{item['instance_type']}.")
+            return None, None, ()
+
+        az_prices = tuple(sorted(((az, float(price)) for az, price in prices_spot.items()), key=lambda entry: entry[1]))
+        az_min, price_min = az_prices[0]
+        return price_min, az_min, az_prices
@@ -0,0 +1,127 @@
+import concurrent.futures
+import logging
+import threading
+import time
+from collections import defaultdict
+
+RUNNING = 'running'
+FAILED_STATES = ('shutting-down', 'terminated', 'stopping', 'stopped')
+# O filtro instance-id aceita até 200 valores e, ao contrário de InstanceIds,
+# não falha com InvalidInstanceID.NotFound logo após o create_fleet.
+FILTER_BATCH = 200
+
+
+class _ReadinessRequest:
+    def __init__(self, region, instance_ids, on_ready, deadline):
+        self.region = region
+        self.pending = set(instance_ids)
+        self.ready = {}
+        self.on_ready = on_ready
+        self.deadline = deadline
+        self.future = concurrent.futures.Future()
+
+    def resolve(self, instance, running):
+        instance_id = instance['InstanceId']
+        if instance_id not in self.pending:
+            return
+        self.pending.discard(instance_id)
+        if not running:
+            logging.warning(f"ReadinessTracker: instância {instance_id} terminou em '{instance['State']['Name']}' antes de ficar pronta.")
+            return
+        self.ready[instance_id] = instance
+        if self.on_ready:
+            try:
+                self.on_ready(instance_id, instance)
+            except Exception as e:
+                logging.error(f"ReadinessTracker: erro no callback de {instance_id}: {e}")
+
+
+class ReadinessTracker:
+    # Substitui um waiter instance_running por frota: uma única thread consulta
+    # describe_instances para todas as frotas pendentes, agrupando os ids por
+    # região, e resolve cada instância assim que ela entra em 'running'. O
+    # intervalo volta a min_interval sempre que alguma instância muda de estado e
+    # cresce até max_interval enquanto nada muda.
+    def __init__(self, client_for, min_interval=1.0, max_interval=15.0, backoff=1.5, timeout=600):
+        self.client_for = client_for
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self._requests = []
+        self._interval = min_interval
+        self._thread = None
+        self._condition = threading.Condition()
+
+    def track(self, region, instance_ids, on_ready=None, timeout=None):
+        # Retorna um Future com {instance_id: instância do describe_instances} das
+        # que ficaram prontas; on_ready(instance_id, instância) é chamado para cada
+        # uma assim que entra em 'running'. No timeout, resolve com as que já estão.
+        request = _ReadinessRequest(region, instance_ids, on_ready, time.monotonic() + (timeout or self.timeout))
+        if not request.pending:
+            request.future.set_result({})
+            return request.future
+
+        with self._condition:
+            self._requests.append(request)
+            self._interval = self.min_interval
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ReadinessTracker", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return request.future
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._requests:
+                    self._thread = None
+                    return
+                requests = list(self._requests)
+
+            progressed = self._poll(requests)
+
+            with self._condition:
+                self._requests = [request for request in self._requests if not request.future.done()]
+                self._interval = self.min_interval if progressed else min(self._interval * self.backoff, self.max_interval)
+                if self._requests:
+                    self._condition.wait(self._interval)
+
+    def _poll(self, requests):
+        waiting_by_region = defaultdict(lambda: defaultdict(list))
+        for request in requests:
+            for instance_id in request.pending:
+                waiting_by_region[request.region][instance_id].append(request)
+
+        progressed = False
+        for region, waiting in waiting_by_region.items():
+            instance_ids = list(waiting)
+            for start in range(0, len(instance_ids), FILTER_BATCH):
+                try:
+                    instances = self._describe(region, instance_ids[start:start + FILTER_BATCH])
+                except Exception as e:
+                    logging.warning(f"ReadinessTracker: describe_instances falhou em {region}: {e}")
+                    continue
+
+                for instance in instances:
+                    state = instance.get('State', {}).get('Name')
+                    if state != RUNNING and state not in FAILED_STATES:
+                        continue
+                    progressed = True
+                    for request in waiting.get(instance['InstanceId'], ()):
+                        request.resolve(instance, state == RUNNING)
+
+        now = time.monotonic()
+        for request in requests:
+            if not request.pending:
+                request.future.set_result(request.ready)
+            elif now > request.deadline:
+                logging.warning(f"ReadinessTracker: {len(request.pending)} instâncias em {request.region} não ficaram prontas a tempo: {sorted(request.pending)}")
+                request.future.set_result(request.ready)
+        return progressed
+
+    def _describe(self, region, instance_ids):
+        paginator = self.client_for(region).get_paginator('describe_instances')
+        pages = paginator.paginate(Filters=[{'Name': 'instance-id', 'Values': instance_ids}])
+        return [instance for page in pages for reservation in page['Reservations'] for instance in reservation['Instances']]
@@ -0,0 +1,162 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name):
+        super().__init__(f"Circuito aberto para '{name}'. Requisição recusada sem chamar o backend.")
+        self.name = name
+
+
+class AdaptiveTokenBucket:
+    # Token bucket com AIMD: a taxa cai pela metade diante de 429/5xx (no máximo
+    # uma vez por decrease_interval) e volta a subir enquanto as respostas forem
+    # saudáveis, até max_rate (None: sem teto). Com rate=None não há limite até o
+    # primeiro 429/5xx; a partir dele vale a metade da taxa medida no último segundo.
+    def __init__(self, rate=None, burst=10, min_rate=1.0, max_rate=None, increase_step=1.0, decrease_interval=1.0):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_interval = decrease_interval
+
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._decreased_at = 0.0
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def try_acquire(self):
+        # Consome um token e retorna 0, ou retorna quantos segundos esperar antes
+        # de tentar de novo (para quem não pode bloquear a thread, ex.: asyncio).
+        with self._lock:
+            now = time.monotonic()
+            if self.rate is None:
+                self._recent.append(now)
+                while now - self._recent[0] > 1.0:
+                    self._recent.popleft()
+                return 0.0
+
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def on_throttle(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._decreased_at >= self.decrease_interval:
+                if self.rate is None:
+                    self.rate = float(len(self._recent))
+                    self._recent.clear()
+                    self._tokens = 0.0
+                    self._updated_at = now
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._decreased_at = now
+
+    def on_success(self):
+        with self._lock:
+            if self.rate is None:
+                return
+            self.rate += self.increase_step
+            if self.max_rate is not None:
+                self.rate = min(self.max_rate, self.rate)
+
+
+class RetryBudget:
+    # Limita as retentativas a uma fração das requisições, para que um backend
+    # degradado não receba uma tempestade de retries.
+    def __init__(self, ratio=0.2, min_retries=10):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.requests = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def try_spend(self):
+        with self._lock:
+            if self.retries >= self.min_retries + self.ratio * self.requests:
+                return False
+            self.retries += 1
+            return True
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+
+            # Em half-open apenas uma requisição de teste passa por vez.
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logging.info(f"CircuitBreaker '{self.name}': backend recuperado, circuito fechado.")
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logging.warning(f"CircuitBreaker '{self.name}': {self._failures} falhas consecutivas, circuito aberto por {self.reset_timeout}s.")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+
+class ProviderGuard:
+    def __init__(self, name, requests_per_second=None, max_requests_per_second=None, retry_ratio=0.2, failure_threshold=5, reset_timeout=30):
+        self.limiter = AdaptiveTokenBucket(rate=requests_per_second, max_rate=max_requests_per_second)
+        self.budget = RetryBudget(ratio=retry_ratio)
+        self.breaker = CircuitBreaker(name, failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+
+
+def backoff_delay(attempt, base=0.2, cap=5.0):
+    # Full jitter: espera aleatória entre 0 e base * 2^attempt (limitada a cap).
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
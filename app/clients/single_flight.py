@@ -0,0 +1,77 @@
+import asyncio
+import concurrent.futures
+import threading
+
+
+class SingleFlight:
+    # Chamadas concorrentes com a mesma chave compartilham uma única execução:
+    # a primeira thread executa, as demais aguardam e recebem o mesmo resultado.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.calls = 0
+        self.deduplicated = 0
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            call = self._in_flight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = concurrent.futures.Future()
+                self._in_flight[key] = call
+                self.calls += 1
+            else:
+                self.deduplicated += 1
+
+        if not is_leader:
+            return call.result()
+
+        try:
+            result = fn(*args)
+            call.set_result(result)
+            return result
+        except BaseException as exc:
+            call.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    async def do_async(self, key, coro_fn, *args):
+        # Versão para corrotinas; compartilha as chamadas em voo com do(), então
+        # uma cotação assíncrona e uma com threads para a mesma chave também se juntam.
+        with self._lock:
+            call = self._in_flight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = concurrent.futures.Future()
+                self._in_flight[key] = call
+                self.calls += 1
+            else:
+                self.deduplicated += 1
+
+        if not is_leader:
+            return await asyncio.wrap_future(call)
+
+        try:
+            result = await coro_fn(*args)
+            call.set_result(result)
+            return result
+        except BaseException as exc:
+            call.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "deduplicated": self.deduplicated}
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls = 0
+            self.deduplicated = 0
+
+
+price_flight = SingleFlight()
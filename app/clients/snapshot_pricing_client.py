@@ -0,0 +1,120 @@
+import csv
+import glob
+import json
+import logging
+import os
+import re
+import threading
+from collections import defaultdict
+
+from .pricing_client import PricingClient
+
+
+class SnapshotPricingClient(PricingClient):
+    # Backend de preços offline: responde get_prices_for a partir dos CSVs em
+    # csv_results/ e dos catálogos gravados em results/*.json, sem rede.
+    # Os arquivos são lidos uma única vez por processo.
+    _indexes = {}
+    _indexes_lock = threading.Lock()
+
+    def __init__(self, csv_dir='./csv_results', results_dir='./results', replay=False):
+        super().__init__(max_workers=1)
+        self.csv_dir = csv_dir
+        self.results_dir = results_dir
+        self.replay = replay
+        self.index = self._load_index(csv_dir, results_dir)
+        self._cursors = defaultdict(int)
+        self._cursors_lock = threading.Lock()
+
+    def _fetch(self, all_data):
+        for item in all_data:
+            observations = self.index.get((item["provider"], item["instance_type"], item["region"]))
+            if not observations:
+                yield item, (None, None, ())
+                continue
+            yield item, self._parse_prices(item, self._pick(item, observations))
+
+    def _pick(self, item, observations):
+        # Sem replay, usa a cotação mais recente. Com replay, cada chamada avança
+        # uma posição no histórico gravado (voltando ao início no fim).
+        if not self.replay:
+            return observations[-1]
+
+        key = (item["provider"], item["instance_type"], item["region"])
+        with self._cursors_lock:
+            position = self._cursors[key]
+            self._cursors[key] = position + 1
+        return observations[position % len(observations)]
+
+    @classmethod
+    def _load_index(cls, csv_dir, results_dir):
+        with cls._indexes_lock:
+            key = (os.path.abspath(csv_dir), os.path.abspath(results_dir))
+            if key not in cls._indexes:
+                cls._indexes[key] = cls._build_index(csv_dir, results_dir)
+            return cls._indexes[key]
+
+    @classmethod
+    def _build_index(cls, csv_dir, results_dir):
+        # (provider, instance_type, region) -> lista de observações {az: preço}, da mais antiga para a mais recente
+        index = defaultdict(list)
+
+        for path in sorted(glob.glob(os.path.join(csv_dir, 'azure_vms_*.csv'))):
+            region = re.match(r'azure_vms_(.+)\.csv', os.path.basename(path)).group(1)
+            with open(path, 'r', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    price = cls._to_price(row.get('Spot_Price_USD'))
+                    if price is not None:
+                        index[('azure', cls._azure_catalog_name(row['VM_Size']), region)].append({region: price})
+
+        # Os mapeamentos AWS -> Azure foram gerados a partir do catálogo de eastus.
+        for path in sorted(glob.glob(os.path.join(csv_dir, 'aws_to_azure_*_mapping*.csv'))):
+            with open(path, 'r', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    price = cls._to_price(row.get('Azure_Spot_Price'))
+                    key = ('azure', cls._azure_catalog_name(row.get('Azure_Equivalent_Type', 'N/A')), 'eastus')
+                    if price is not None and key not in index:
+                        index[key].append({'eastus': price})
+
+        for path in sorted(glob.glob(os.path.join(results_dir, 'test_battery_results_*.json'))):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    tests = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logging.warning(f"SnapshotPricingClient: ignorando '{path}': {e}")
+                continue
+
+            snapshot = defaultdict(dict)
+            for test in tests:
+                for entry in cls._flatten(test.get('pricing_catalog') or []):
+                    key = (entry['provider'], entry['instance_type'], entry['region'])
+                    az_prices = entry.get('az_prices') or [(entry['region_az'], entry['price'])]
+                    snapshot[key].update({az: float(price) for az, price in az_prices})
+
+            for key, prices_spot in snapshot.items():
+                if not index[key] or index[key][-1] != prices_spot:
+                    index[key].append(prices_spot)
+
+        logging.info(f"SnapshotPricingClient: índice carregado com {len(index)} tipos de instância.")
+        return dict(index)
+
+    @staticmethod
+    def _flatten(pricing_catalog):
+        for entry in pricing_catalog:
+            if isinstance(entry, list):
+                yield from entry
+            else:
+                yield entry
+
+    @staticmethod
+    def _azure_catalog_name(vm_size):
+        # 'Standard_D2ads_v5' -> 'D2ads v5', como em vm_catalog.yaml
+        name = vm_size[len('Standard_'):] if vm_size.startswith('Standard_') else vm_size
+        return name.replace('_', ' ')
+
+    @staticmethod
+    def _to_price(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,263 @@
+import bisect
+import copy
+import hashlib
+import logging
+import os
+import pickle
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Optional
+
+import yaml
+
+DEFAULT_CATALOG_PATH = './config/vm_catalog.yaml'
+DEFAULT_CATALOG_CACHE_DIR = './cache/catalog'
+# Incrementar quando a estrutura indexada mudar, para invalidar os pickles antigos.
+CATALOG_FORMAT_VERSION = 2
+
+# Localização (--location) de cada região conhecida. Regiões novas podem declarar
+# 'location' diretamente em vm_catalog.yaml; sem nenhuma das duas informações a
+# região só entra com --location both.
+REGION_LOCATIONS = {
+    'sa-east-1': 'br',
+    'brazilsouth': 'br',
+    'us-east-1': 'us',
+    'eastus': 'us',
+}
+
+FAMILIES = ('general', 'compute', 'memory', 'storage', 'accelerated', 'hpc')
+VENDORS = ('intel', 'amd', 'arm')
+
+# Mesmas regras de aws_to_azure.py, aplicadas aos nomes usados em vm_catalog.yaml.
+AWS_FAMILY_BY_PREFIX = {
+    'm': 'general', 't': 'general', 'a': 'general', 'c': 'compute',
+    'r': 'memory', 'x': 'memory', 'z': 'memory', 'i': 'storage', 'd': 'storage', 'h': 'storage',
+    'p': 'accelerated', 'g': 'accelerated', 'f': 'accelerated', 'inf': 'accelerated', 'hpc': 'hpc'
+}
+AZURE_FAMILY_BY_PREFIX = {
+    'D': 'general', 'B': 'general', 'A': 'general', 'F': 'compute',
+    'E': 'memory', 'M': 'memory', 'L': 'storage', 'N': 'accelerated', 'H': 'hpc'
+}
+
+
+def _name_parts(provider_name, instance_name):
+    # 'm5ad.24xlarge' -> ('m', 'ad'); 'E96-24ds v6' -> ('E', 'ds')
+    if provider_name == 'aws':
+        match = re.match(r'([a-z]+)(\d*)([a-z-]*)', instance_name.split('.')[0])
+    else:
+        match = re.match(r'([A-Z]+)(\d*)(?:-\d+)?([a-z]*)', instance_name.split(' ')[0])
+    return (match.group(1), match.group(3)) if match else ('', '')
+
+
+def instance_family(provider_name, instance_type):
+    if instance_type.get('family'):
+        return instance_type['family']
+    prefix, _ = _name_parts(provider_name, instance_type['name'])
+    families = AWS_FAMILY_BY_PREFIX if provider_name == 'aws' else AZURE_FAMILY_BY_PREFIX
+    for length in range(len(prefix), 0, -1):
+        if prefix[:length] in families:
+            return families[prefix[:length]]
+    return 'unknown'
+
+
+def cpu_vendor(provider_name, instance_type):
+    if instance_type.get('vendor'):
+        return instance_type['vendor']
+    prefix, attributes = _name_parts(provider_name, instance_type['name'])
+    if provider_name == 'aws' and (prefix == 'a' or 'g' in attributes):
+        return 'arm'
+    if provider_name != 'aws' and 'p' in attributes:
+        return 'arm'
+    if 'a' in attributes:
+        return 'amd'
+    return 'intel'
+
+
+@dataclass(frozen=True)
+class InstanceFilter:
+    # Consulta por faixa de vCPUs, RAM mínima (em MiB, como em vm_catalog.yaml),
+    # famílias e fabricantes de CPU. Coleções vazias aceitam qualquer valor;
+    # tipos sem 'ram' no catálogo ficam de fora quando min_ram é informado.
+    min_vcpus: int = 0
+    max_vcpus: Optional[int] = None
+    min_ram: int = 0
+    families: tuple = ()
+    vendors: tuple = ()
+
+    @classmethod
+    def coerce(cls, value):
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, dict):
+            return cls(**{key: tuple(item) if isinstance(item, list) else item for key, item in value.items()})
+        return cls(min_vcpus=value, max_vcpus=value)
+
+    def accepts(self, family, vendor):
+        return (not self.families or family in self.families) and (not self.vendors or vendor in self.vendors)
+
+    def matches(self, provider_name, instance_type):
+        vcpus = instance_type.get('vcpus', 0)
+        if vcpus < self.min_vcpus or (self.max_vcpus is not None and vcpus > self.max_vcpus):
+            return False
+        if self.min_ram and instance_type.get('ram', 0) < self.min_ram:
+            return False
+        return self.accepts(instance_family(provider_name, instance_type), cpu_vendor(provider_name, instance_type))
+
+    def __str__(self):
+        if self == InstanceFilter(self.min_vcpus, self.min_vcpus):
+            return str(self.min_vcpus)
+        parts = [f"{self.min_vcpus}-{self.max_vcpus if self.max_vcpus is not None else '∞'} vCPUs"]
+        if self.min_ram:
+            parts.append(f"RAM >= {self.min_ram // 1024} GiB")
+        if self.families:
+            parts.append('/'.join(self.families))
+        if self.vendors:
+            parts.append('/'.join(self.vendors))
+        return ', '.join(parts)
+
+
+class CompiledCatalog:
+    # vm_catalog.yaml já achatado e indexado. Compilado uma vez por processo e
+    # guardado em disco pelo hash do arquivo, para que nenhum chamador precise
+    # reler ou re-parsear o YAML.
+    _loaded = {}
+    _load_lock = threading.Lock()
+
+    def __init__(self, config, source_hash=None):
+        self.config = self._flatten(config)
+        self.source_hash = source_hash
+
+        # provider -> region -> vcpus -> [tipos]
+        self.instance_types = {}
+        # provider -> region -> (família, fabricante) -> (vcpus ordenados, tipos na mesma ordem)
+        self.filter_index = {}
+        # region -> az -> subnet
+        self.subnets = {}
+
+        for provider_name, provider_config in self.config.get('providers', {}).items():
+            by_region = self.instance_types.setdefault(provider_name, {})
+            for region_name, region_data in (provider_config.get('regions') or {}).items():
+                by_vcpus = defaultdict(list)
+                for instance_type in region_data.get('instance_types', []):
+                    by_vcpus[instance_type.get('vcpus', 0)].append(instance_type)
+                by_region[region_name] = dict(by_vcpus)
+
+                buckets = defaultdict(list)
+                for instance_type in region_data.get('instance_types', []):
+                    key = (instance_family(provider_name, instance_type), cpu_vendor(provider_name, instance_type))
+                    buckets[key].append(instance_type)
+                self.filter_index.setdefault(provider_name, {})[region_name] = {
+                    key: ([entry.get('vcpus', 0) for entry in entries], entries)
+                    for key, entries in (
+                        (key, sorted(entries, key=lambda entry: entry.get('vcpus', 0))) for key, entries in buckets.items()
+                    )
+                }
+
+                if region_data.get('availability_zones'):
+                    self.subnets[region_name] = dict(region_data['availability_zones'])
+
+    def __getitem__(self, key):
+        return self.config[key]
+
+    def get(self, key, default=None):
+        return self.config.get(key, default)
+
+    def regions(self, provider_name):
+        return list(self.instance_types.get(provider_name, {}))
+
+    def regions_for(self, provider_name, location):
+        regions = (self.config.get('providers', {}).get(provider_name) or {}).get('regions') or {}
+        if location in (None, 'both'):
+            return list(regions)
+        return [
+            name for name, data in regions.items()
+            if (data or {}).get('location', REGION_LOCATIONS.get(name)) == location
+        ]
+
+    def types_for(self, provider_name, region_name, vcpus):
+        return self.instance_types.get(provider_name, {}).get(region_name, {}).get(vcpus, [])
+
+    def select(self, provider_name, region_name, instance_filter):
+        # Aceita um número de vCPUs (busca exata, como types_for) ou um InstanceFilter.
+        # Cada balde (família, fabricante) é filtrado por bisect na faixa de vCPUs,
+        # então só os tipos dentro da faixa são visitados.
+        instance_filter = InstanceFilter.coerce(instance_filter)
+        selected = []
+        for (family, vendor), (vcpus_keys, entries) in self.filter_index.get(provider_name, {}).get(region_name, {}).items():
+            if not instance_filter.accepts(family, vendor):
+                continue
+            low = bisect.bisect_left(vcpus_keys, instance_filter.min_vcpus)
+            high = len(vcpus_keys) if instance_filter.max_vcpus is None else bisect.bisect_right(vcpus_keys, instance_filter.max_vcpus)
+            selected.extend(
+                entry for entry in entries[low:high]
+                if not instance_filter.min_ram or entry.get('ram', 0) >= instance_filter.min_ram
+            )
+        return selected
+
+    def subnet_for(self, region_name, region_az):
+        return self.subnets.get(region_name, {}).get(region_az)
+
+    def az_for_subnet(self, region_name, subnet_id):
+        return next((az for az, subnet in self.subnets.get(region_name, {}).items() if subnet == subnet_id), None)
+
+    @staticmethod
+    def _flatten(config):
+        # As âncoras do YAML geram listas aninhadas em instance_types; aqui elas
+        # são achatadas uma única vez, sem alterar o dicionário original.
+        config = copy.deepcopy(config)
+        for provider_config in config.get('providers', {}).values():
+            for region_data in (provider_config.get('regions') or {}).values():
+                flat_instance_list = []
+                for item in region_data.get('instance_types') or []:
+                    if isinstance(item, list):
+                        flat_instance_list.extend(item)
+                    else:
+                        flat_instance_list.append(item)
+                region_data['instance_types'] = flat_instance_list
+        return config
+
+    @classmethod
+    def from_config(cls, catalog_config):
+        if isinstance(catalog_config, cls):
+            return catalog_config
+        return cls(catalog_config)
+
+    @classmethod
+    def load(cls, path=DEFAULT_CATALOG_PATH, cache_dir=DEFAULT_CATALOG_CACHE_DIR):
+        stat = os.stat(path)
+        memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+        with cls._load_lock:
+            if memo_key in cls._loaded:
+                return cls._loaded[memo_key]
+
+            with open(path, 'rb') as f:
+                raw = f.read()
+            source_hash = hashlib.sha256(raw).hexdigest()
+            cache_path = os.path.join(cache_dir, f'vm_catalog-v{CATALOG_FORMAT_VERSION}-{source_hash[:16]}.pickle')
+
+            catalog = None
+            try:
+                with open(cache_path, 'rb') as f:
+                    catalog = pickle.load(f)
+                if catalog.source_hash != source_hash:
+                    catalog = None
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+                catalog = None
+
+            if catalog is None:
+                catalog = cls(yaml.safe_load(raw), source_hash)
+                try:
+                    os.makedirs(cache_dir, exist_ok=True)
+                    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+                    with open(tmp_path, 'wb') as f:
+                        pickle.dump(catalog, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    os.replace(tmp_path, cache_path)
+                except OSError as e:
+                    logging.warning(f"CompiledCatalog: não foi possível salvar o cache em '{cache_path}': {e}")
+                logging.info(f"CompiledCatalog: '{path}' compilado (hash {source_hash[:12]}).")
+
+            cls._loaded[memo_key] = catalog
+            return catalog
@@ -7,10 +7,27 @@ class VMSpec:
     region: str
     region_az: str
     price: float
+    # (az, preço) de todas as AZs cotadas, em ordem crescente de preço
+    az_prices: tuple = ()
+    vcpus: int = 0
+    # MiB, como em vm_catalog.yaml (0 quando o catálogo não informa)
+    ram: int = 0
+    # Unidades de capacidade por instância (ver CostRanker); 1 conta instâncias.
+    weight: float = 1
 
     def to_dict(self):
         return self.__dict__
 
+    @property
+    def unit_price(self):
+        return self.price / self.weight
+
+    def prices_within(self, tolerance):
+        if not self.az_prices:
+            return ((self.region_az, self.price),)
+        ceiling = self.price * (1 + tolerance)
+        return tuple((az, price) for az, price in self.az_prices if price <= ceiling)
+
 
 @dataclass
 class FleetVmSpec:
@@ -21,6 +38,8 @@ class FleetVmSpec:
     price: float
     public_ip: str
     private_ip: str
+    weight: float = 1
+    region: str = ''
 
     def to_dict(self):
         return self.__dict__
@@ -0,0 +1,134 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    def __init__(self, tracer, name, parent, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.error = None
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter_ns()
+        self._ended = False
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error=None):
+        if self._ended:
+            return
+        self._ended = True
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        duration_ns = time.perf_counter_ns() - self._start
+        self.tracer._export({
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.start_ns + duration_ns,
+            "duration_ms": round(duration_ns / 1e6, 3),
+            "status": "ERROR" if self.error else "OK",
+            "error": self.error,
+            "attributes": self.attributes,
+            "resource": self.tracer.resource,
+        })
+
+
+class _NoopSpan:
+    def set(self, **attributes):
+        pass
+
+    def end(self, error=None):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    # Spans aninhados por contextvars, exportados um por linha (JSONL, com os
+    # campos de tempo e ids do OTLP). Sem configure() tudo vira no-op.
+    def __init__(self):
+        self.resource = {}
+        self._file = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self._file is not None
+
+    def configure(self, path, **resource):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            self._file = open(path, 'a', encoding='utf-8')
+            self.resource = resource
+        logging.info(f"Tracing: exportando spans para '{path}'.")
+
+    def shutdown(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def start_span(self, name, **attributes):
+        # Span sem ativação no contexto, para geradores e trechos que terminam
+        # em outro ponto do código; quem chama precisa chamar end().
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, _current_span.get(), attributes)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+        span = Span(self, name, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.end(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def bind(self, fn):
+        # Leva o span atual para a thread que executar fn (ex.: executor.submit).
+        # Cada chamada roda em uma cópia do contexto, então o mesmo fn pode ser
+        # submetido várias vezes em paralelo.
+        if not self.enabled:
+            return fn
+        context = contextvars.copy_context()
+
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            return context.copy().run(fn, *args, **kwargs)
+        return run
+
+    def _export(self, record):
+        line = json.dumps(record, default=str, ensure_ascii=False)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + '\n')
+                self._file.flush()
+
+
+tracer = Tracer()
@@ -7,9 +7,13 @@ class AbstractCloudProvider(ABC):
         pass
     
     @abstractmethod
-    def delete_fleet(self):
+    def delete_fleet(self, fleets=None):
         pass
 
     @abstractmethod
     def get_all_vms(self):
+        pass
+
+    @abstractmethod
+    def terminate_instances(self, vms):
         pass
\ No newline at end of file
@@ -1,12 +1,36 @@
-from .providers.aws_provider import AWSProvider
-from .providers.azure_provider import AzureProvider
+import importlib
+import threading
+
+# Cada provedor é importado só quando pedido: rodar apenas com AWS não carrega o
+# SDK do Azure (e vice-versa).
+PROVIDER_REGISTRY = {
+    "aws": (".providers.aws_provider", "AWSProvider"),
+    "azure": (".providers.azure_provider", "AzureProvider"),
+}
+
 
 class CloudProviderFactory:
+    _classes = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def register(provider_name: str, module_path: str, class_name: str):
+        with CloudProviderFactory._lock:
+            PROVIDER_REGISTRY[provider_name.lower()] = (module_path, class_name)
+            CloudProviderFactory._classes.pop(provider_name.lower(), None)
+
+    @staticmethod
+    def provider_class(provider_name: str):
+        name = provider_name.lower()
+        if name not in PROVIDER_REGISTRY:
+            raise ValueError(f"Provider '{provider_name}' não suportado.")
+        with CloudProviderFactory._lock:
+            if name not in CloudProviderFactory._classes:
+                module_path, class_name = PROVIDER_REGISTRY[name]
+                module = importlib.import_module(module_path, __package__)
+                CloudProviderFactory._classes[name] = getattr(module, class_name)
+            return CloudProviderFactory._classes[name]
+
     @staticmethod
     def get_provider(provider_name: str):
-        if provider_name.lower() == "aws":
-            return AWSProvider()
-        elif provider_name.lower() == "azure":
-            return AzureProvider()
-        else:
-            raise ValueError(f"Provider '{provider_name}' não suportado.")
\ No newline at end of file
+        return CloudProviderFactory.provider_class(provider_name)()
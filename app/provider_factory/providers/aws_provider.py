@@ -1,58 +1,84 @@
+import concurrent.futures
 import logging
-import re
-import subprocess
+import math
+import threading
+import time
+from collections import defaultdict
 
-import yaml
 from ..abstract_factory import AbstractCloudProvider
-import boto3 # type: ignore
+from ...clients.readiness_tracker import ReadinessTracker
 from ...core.models import FleetVmSpec
+from ...core.tracing import tracer
+from ...core.catalog import CompiledCatalog, InstanceFilter
 
 class AWSProvider(AbstractCloudProvider):
     FLEET_NAME = f'AWS-FLEET'
     FLEET_NUM = 1
+    # AZs até 10% mais caras que a mais barata também entram como override,
+    # para que a frota possa buscar capacidade em outra AZ.
+    AZ_PRICE_TOLERANCE = 0.1
+    # Regiões varridas na desmontagem quando o catálogo não está disponível.
+    DEFAULT_REGIONS = ('sa-east-1', 'us-east-1')
+    TEARDOWN_STATES = ['pending', 'running', 'stopping', 'stopped']
+    TERMINATE_BATCH = 1000
+
+    def __init__(self):
+        self._ec2_clients = {}
+        self._client_lock = threading.Lock()
+        # Um único poller de describe_instances para todas as frotas em andamento.
+        self.readiness = ReadinessTracker(self._ec2_client)
+
+    def _next_fleet_name(self):
+        # create_fleet pode rodar em paralelo para vários grupos (FleetService).
+        with self._client_lock:
+            fleet_name = f'{self.FLEET_NAME}-{self.FLEET_NUM}'
+            self.FLEET_NUM += 1
+            return fleet_name
 
-    def get_all_vms(self, provider_config, vcpus, location):
-        LOCATION_MAP = {
-            'br': ['sa-east-1'],
-            'us': ['us-east-1']
-        }
-
-        all_provider_regions = provider_config.get('regions', {})
+    def _ec2_client(self, region):
+        # boto3 só é importado quando a AWS é de fato acionada; o cliente de cada
+        # região é criado uma vez e reaproveitado (clientes são thread-safe, sessões não).
+        with self._client_lock:
+            if region not in self._ec2_clients:
+                import boto3 # type: ignore
+                self._ec2_clients[region] = boto3.Session(region_name=region).client("ec2")
+            return self._ec2_clients[region]
 
-        target_region_names = LOCATION_MAP.get(location)
+    def get_all_vms(self, provider_config, vcpus, location, catalog=None):
+        if catalog is None:
+            catalog = CompiledCatalog({'providers': {'aws': provider_config}})
 
-        if target_region_names:
-            regions_to_process = {
-                name: data 
-                for name, data in all_provider_regions.items() 
-                if name in target_region_names
-            }
-        else:
-            regions_to_process = all_provider_regions
+        instance_filter = InstanceFilter.coerce(vcpus)
+        target_region_names = catalog.regions_for('aws', location)
 
         vms = [
             {
                 'provider': 'aws',
                 'instance_type': instance_type["name"],
                 'vcpus': instance_type['vcpus'],
+                'ram': instance_type.get('ram', 0),
                 'region': region_name,
                 'market': 'spot'
             }
-            for region_name, region_data in regions_to_process.items()
-            for instance_type in region_data.get('instance_types', [])
-            if instance_type.get("vcpus", 0) == vcpus
+            for region_name in target_region_names
+            for instance_type in catalog.select('aws', region_name, instance_filter)
         ]   
 
         return vms
     
 
-    def create_fleet(self, instances, allocation_strategy, target_capacity, tag='MultiCloud'):
-        
+    def create_fleet(self, instances, allocation_strategy, target_capacity, tag='MultiCloud', capacity_unit='instance', on_ready=None):
+        with tracer.span('aws.create_fleet', region=instances[0].region, group_size=len(instances), target_capacity=target_capacity) as span:
+            fleet_id, fleet_vms, errors = self._create_fleet(instances, allocation_strategy, target_capacity, tag, capacity_unit, on_ready)
+            span.set(fleet_id=fleet_id, instances=len(fleet_vms or []), errors=len(errors or []))
+            return fleet_id, fleet_vms, errors
+
+    def _create_fleet(self, instances, allocation_strategy, target_capacity, tag, capacity_unit, on_ready):
         region = instances[0].region
-        session = boto3.Session(region_name=region)
-        ec2_client = session.client("ec2")
+        ec2_client = self._ec2_client(region)
 
-        overrides = self._instance_template_config(instances)
+        weighted = capacity_unit != 'instance'
+        overrides = self._instance_template_config(instances, weighted)
 
         launch_template_config = [
             {
@@ -67,7 +93,7 @@ class AWSProvider(AbstractCloudProvider):
         fleet_config = {
             "LaunchTemplateConfigs": launch_template_config,
             "TargetCapacitySpecification": {
-                "TotalTargetCapacity": target_capacity,
+                "TotalTargetCapacity": math.ceil(target_capacity),
                 "DefaultTargetCapacityType": "spot"
             },
             "SpotOptions": {
@@ -82,30 +108,50 @@ class AWSProvider(AbstractCloudProvider):
         }
     
         try:
-            fleet_name = f'{self.FLEET_NAME}-{self.FLEET_NUM}'
+            fleet_name = self._next_fleet_name()
             logging.info(f"Tentando criar Frota com {target_capacity} instâncias na região {region}...")
-            response = ec2_client.create_fleet(**fleet_config)
-            fleet_id = response.get("FleetId")
-            instance_ids = [inst for fleet in response.get("Instances", []) for inst in fleet["InstanceIds"]]
-            errors = response.get('Errors', [])
+            with tracer.span('aws.request_fleet', region=region) as request_span:
+                response = ec2_client.create_fleet(**fleet_config)
+                fleet_id = response.get("FleetId")
+                instance_ids = [inst for fleet in response.get("Instances", []) for inst in fleet["InstanceIds"]]
+                errors = response.get('Errors', [])
+                request_span.set(instance_count=len(instance_ids), errors=len(errors))
 
             if not instance_ids:
                 return fleet_id, [], errors
 
             logging.info(f"Frota {fleet_id} criada com {len(instance_ids)} instâncias. Aguardando execução...")
 
-            waiter = ec2_client.get_waiter('instance_running')
-            waiter.wait(InstanceIds=instance_ids, WaiterConfig={'Delay': 15, 'MaxAttempts': 40})
-            
-            logging.info(f"Instâncias em execução. Buscando todos os detalhes para: {instance_ids}...")
-            instance_details_map = self._get_instance_details(session, instance_ids)
+            weights = {inst.instance_type: inst.weight for inst in instances}
+
+            def instance_ready(instance_id, instance):
+                logging.info(f"Instância {instance_id} ({instance.get('InstanceType')}) em execução: {instance.get('PublicIpAddress', 'N/A')}")
+                # on_ready recebe as unidades de capacidade que acabaram de ficar prontas.
+                if on_ready:
+                    on_ready(weights.get(instance.get('InstanceType'), 1))
+
+            # O poller é compartilhado, mas create_fleet ainda devolve a frota já
+            # pronta: a thread do chamador espera aqui até todas entrarem em
+            # 'running' ou o timeout do ReadinessTracker; quem precisa reagir antes
+            # usa on_ready.
+            with tracer.span('aws.wait_running', region=region, instance_count=len(instance_ids)) as wait_span:
+                ready = self.readiness.track(region, instance_ids, on_ready=instance_ready).result()
+                wait_span.set(ready=len(ready))
+
+            logging.info(f"{len(ready)}/{len(instance_ids)} instâncias da frota {fleet_id} em execução.")
+            not_ready = sorted(set(instance_ids) - set(ready))
+            if not_ready:
+                self._terminate_not_ready(ec2_client, fleet_id, not_ready)
+            instance_details_map = {instance_id: self._instance_details(instance) for instance_id, instance in ready.items()}
 
             fleet_vms = []
             for instance_id, details in instance_details_map.items():
                 price = 0
+                weight = 1
                 for inst in instances:
                     if inst.instance_type == details['instance_type']:
-                        price = inst.price
+                        price = dict(inst.az_prices).get(details['region_az'], inst.price)
+                        weight = inst.weight
                 spec = FleetVmSpec(
                     provider='aws',
                     instance_id=instance_id,
@@ -114,12 +160,13 @@ class AWSProvider(AbstractCloudProvider):
                     price=price,
                     public_ip=details['public_ip'],
                     private_ip=details['private_ip'],
+                    weight=weight,
+                    region=region,
                 )
                 fleet_vms.append(spec)
             
             logging.info(f"{len(fleet_vms)} instâncias da frota {fleet_id} foram formatadas com sucesso.")
 
-            self.FLEET_NUM += 1
             return fleet_name, fleet_vms, errors
 
         except Exception as e:
@@ -127,76 +174,132 @@ class AWSProvider(AbstractCloudProvider):
             return None, None, None
 
 
-    def delete_fleet(self):
-        self._delete_command('sa-east-1')
-        self._delete_command('us-east-1')
+    def _terminate_not_ready(self, ec2_client, fleet_id, instance_ids):
+        # Instâncias que não entraram em 'running' a tempo (ou falharam) não fazem
+        # parte da frota devolvida nem do FleetStateStore: são encerradas aqui
+        # para não ficarem rodando sem contabilidade.
+        logging.warning(f"Frota {fleet_id}: {len(instance_ids)} instâncias não ficaram prontas e serão encerradas: {instance_ids}")
+        try:
+            for start in range(0, len(instance_ids), self.TERMINATE_BATCH):
+                ec2_client.terminate_instances(InstanceIds=instance_ids[start:start + self.TERMINATE_BATCH])
+        except Exception as e:
+            logging.error(f"Frota {fleet_id}: falha ao encerrar instâncias não prontas {instance_ids} (a desmontagem pela tag as encontrará): {e}")
+
+    def delete_fleet(self, fleets=None, tag='MultiCloud'):
+        # Desmonta todas as regiões ao mesmo tempo: em cada uma, descobre as
+        # instâncias com a tag via describe_instances paginado, soma as que o
+        # FleetStateStore conhece (fleets: {fleet_id: [FleetVmSpec]}) e encerra em
+        # lotes. Retorna {região: relatório}.
+        known_ids = defaultdict(set)
+        for vms in (fleets or {}).values():
+            for vm in vms:
+                known_ids[vm.region or vm.region_az[:-1]].add(vm.instance_id)
+
+        try:
+            regions = set(CompiledCatalog.load().regions_for('aws', None))
+        except Exception as e:
+            logging.warning(f"Catálogo indisponível para a desmontagem, usando as regiões padrão: {e}")
+            regions = set(self.DEFAULT_REGIONS)
+        regions |= set(known_ids)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(regions)), thread_name_prefix="AWSTeardown") as executor:
+            future_to_region = {
+                executor.submit(tracer.bind(self._teardown_region), region, tag, known_ids.get(region, set())): region
+                for region in sorted(regions)
+            }
+            return {future_to_region[future]: future.result() for future in concurrent.futures.as_completed(future_to_region)}
 
 
-    def _delete_command(self, region, tag='MultiCloud'):
-        command = f'aws ec2 describe-instances --region {region} --filters "Name=tag:Name,Values={tag}" "Name=instance-state-name,Values=running" --query "Reservations[*].Instances[*].InstanceId" --output text'
-        session = boto3.Session(region_name=region)
-        ec2_client = session.client("ec2")
+    def _teardown_region(self, region, tag, known_ids):
+        with tracer.span('aws.teardown_region', region=region, known=len(known_ids)) as span:
+            report = self._terminate_region(region, tag, known_ids)
+            span.set(found=report["found"], terminated=report["terminated"], error=report["error"])
+            return report
 
+    def _terminate_region(self, region, tag, known_ids):
+        started_at = time.monotonic()
+        report = {"found": 0, "terminated": 0, "seconds": 0.0, "error": None}
         try:
-            result = subprocess.run(command, shell=True, check=True, capture_output=True)
-            input_string = result.stdout.decode() if isinstance(result.stdout, bytes) else str(result.stdout)
-            instances_ids = re.findall(r'\bi-[0-9a-f]{17}\b', input_string)
-
-            if(instances_ids):
-                print(f"Terminating {len(instances_ids)} instances...")
-                response = ec2_client.terminate_instances(
-                    InstanceIds=instances_ids,
-                )
-                print(f"{len(instances_ids)} instances terminated")
+            ec2_client = self._ec2_client(region)
+            pages = ec2_client.get_paginator('describe_instances').paginate(Filters=[
+                {'Name': 'tag:Name', 'Values': [tag]},
+                {'Name': 'instance-state-name', 'Values': self.TEARDOWN_STATES},
+            ])
+            discovered = {instance['InstanceId'] for page in pages for reservation in page['Reservations'] for instance in reservation['Instances']}
+            instance_ids = sorted(discovered | known_ids)
+            report["found"] = len(instance_ids)
+
+            for start in range(0, len(instance_ids), self.TERMINATE_BATCH):
+                batch = instance_ids[start:start + self.TERMINATE_BATCH]
+                try:
+                    ec2_client.terminate_instances(InstanceIds=batch)
+                except Exception as e:
+                    # Ids antigos do estado local que a EC2 já esqueceu invalidam o
+                    # lote inteiro; repete só com os que a busca por tag encontrou.
+                    if 'InvalidInstanceID' not in str(e):
+                        raise
+                    batch = [instance_id for instance_id in batch if instance_id in discovered]
+                    if batch:
+                        ec2_client.terminate_instances(InstanceIds=batch)
+                report["terminated"] += len(batch)
+        except Exception as e:
+            report["error"] = str(e)
+            logging.error(f"Falha ao desmontar {region}: {e}")
 
+        report["seconds"] = round(time.monotonic() - started_at, 3)
+        if report["found"]:
+            logging.info(f"{region}: {report['terminated']}/{report['found']} instâncias encerradas em {report['seconds']}s.")
+        return report
 
-            else:
-                print(f'No running instances found.')
-            
-        except subprocess.CalledProcessError as e:
-            print(f"Error executing command: {e}")
-    
 
-    def _instance_template_config(self, instances):
-        with open('caminho/vm_catalog.yaml', 'r') as f: 
-            data = yaml.safe_load(f)
+    def terminate_instances(self, vms):
+        # Encerra VMs específicas (ex.: excedente de um provisionamento paralelo)
+        # e retorna os ids efetivamente encerrados.
+        instance_ids_by_region = defaultdict(list)
+        for vm in vms:
+            instance_ids_by_region[vm.region or vm.region_az[:-1]].append(vm.instance_id)
+
+        terminated = []
+        for region, instance_ids in instance_ids_by_region.items():
+            try:
+                self._ec2_client(region).terminate_instances(InstanceIds=instance_ids)
+                terminated.extend(instance_ids)
+                logging.info(f"{len(instance_ids)} instâncias encerradas em {region}: {instance_ids}")
+            except Exception as e:
+                logging.error(f"Falha ao encerrar instâncias em {region}: {e}")
+        return terminated
+
+
+    def _instance_template_config(self, instances, weighted=False):
+        catalog = CompiledCatalog.load()
 
         overrides = []
 
         for inst in instances:
             instance_type = inst.instance_type
-            subnet_id = data['providers']['aws']['regions'][inst.region]['availability_zones'][inst.region_az]
-            overrides.append({
-                'InstanceType': instance_type,
-                'SubnetId': subnet_id
-            })
+            for region_az, _ in inst.prices_within(self.AZ_PRICE_TOLERANCE):
+                subnet_id = catalog.subnet_for(inst.region, region_az)
+                if subnet_id is None:
+                    continue
+                override = {
+                    'InstanceType': instance_type,
+                    'SubnetId': subnet_id
+                }
+                if weighted:
+                    # Cada instância conta como inst.weight unidades (vCPUs ou GiB) da capacidade alvo.
+                    override['WeightedCapacity'] = float(inst.weight)
+                overrides.append(override)
 
         return overrides
     
    
-    def _get_instance_details(self, session, instance_ids):
-        if not instance_ids:
-            return {}
-
-        ec2_client = session.client("ec2")
-        details_map = {}
-
-        try:
-            response = ec2_client.describe_instances(InstanceIds=instance_ids)
-            for reservation in response['Reservations']:
-                for instance in reservation['Instances']:
-                    instance_id = instance['InstanceId']
-                    
-                    details_map[instance_id] = {
-                        'instance_type': instance.get('InstanceType', 'N/A'),
-                        'region_az': instance.get('Placement', {}).get('AvailabilityZone', 'N/A'),
-                        'public_ip': instance.get('PublicIpAddress', 'N/A'),
-                        'private_ip': instance.get('PrivateIpAddress', 'N/A'),
-                        'status': instance.get('State', {}).get('Name', 'unknown')
-                    }
-        except Exception as e:
-            logging.error(f"Erro ao chamar describe_instances: {e}")
-            return details_map
-
-        return details_map
+    @staticmethod
+    def _instance_details(instance):
+        return {
+            'instance_type': instance.get('InstanceType', 'N/A'),
+            'region_az': instance.get('Placement', {}).get('AvailabilityZone', 'N/A'),
+            'public_ip': instance.get('PublicIpAddress', 'N/A'),
+            'private_ip': instance.get('PrivateIpAddress', 'N/A'),
+            'status': instance.get('State', {}).get('Name', 'unknown')
+        }
     
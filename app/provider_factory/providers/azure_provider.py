@@ -1,12 +1,13 @@
 import logging
+import math
+import threading
 import time
+from functools import cached_property
 
 from ...core.models import FleetVmSpec
+from ...core.tracing import tracer
+from ...core.catalog import CompiledCatalog, InstanceFilter
 from ..abstract_factory import AbstractCloudProvider
-from azure.identity import DefaultAzureCredential
-from azure.mgmt.computefleet import ComputeFleetMgmtClient # type: ignore
-from azure.mgmt.compute import ComputeManagementClient # type: ignore
-from azure.mgmt.network import NetworkManagementClient # type: ignore
 from azure.core.exceptions import ResourceNotFoundError, HttpResponseError
 
 class AzureProvider(AbstractCloudProvider):
@@ -17,48 +18,76 @@ class AzureProvider(AbstractCloudProvider):
     ADMIN_PASSWORD = "admin"
     FLEET_NAME = f'AZURE-FLEET'
 
-    credential = DefaultAzureCredential()
-    fleet_client = ComputeFleetMgmtClient(credential, SUBSCRIPTION_ID)
-    compute_client = ComputeManagementClient(credential, SUBSCRIPTION_ID)
-    network_client = NetworkManagementClient(credential, SUBSCRIPTION_ID)
-
     fleet_names = []
 
-    def get_all_vms(self, provider_config, vcpus, location):
-        LOCATION_MAP = {
-            'br': ['brazilsouth'],
-        }
-
-        all_provider_regions = provider_config.get('regions', {})
-        
-        target_region_names = LOCATION_MAP.get('br')
+    # Credencial e clientes de gerenciamento só são criados no primeiro uso:
+    # montar o catálogo não precisa de nenhum deles.
+    _client_lock = threading.Lock()
 
-        if target_region_names:
-            regions_to_process = {
-                name: data 
-                for name, data in all_provider_regions.items() 
-                if name in target_region_names
-            }
-        else:
-            regions_to_process = all_provider_regions
+    def _next_fleet_name(self):
+        # create_fleet pode rodar em paralelo para vários grupos (FleetService).
+        with self._client_lock:
+            fleet_name = f'{self.FLEET_NAME}-{self.FLEET_NUM}'
+            self.FLEET_NUM += 1
+            return fleet_name
+
+    @cached_property
+    def credential(self):
+        from azure.identity import DefaultAzureCredential
+        with self._client_lock:
+            return DefaultAzureCredential()
+
+    @cached_property
+    def fleet_client(self):
+        from azure.mgmt.computefleet import ComputeFleetMgmtClient # type: ignore
+        credential = self.credential
+        with self._client_lock:
+            return ComputeFleetMgmtClient(credential, self.SUBSCRIPTION_ID)
+
+    @cached_property
+    def compute_client(self):
+        from azure.mgmt.compute import ComputeManagementClient # type: ignore
+        credential = self.credential
+        with self._client_lock:
+            return ComputeManagementClient(credential, self.SUBSCRIPTION_ID)
+
+    @cached_property
+    def network_client(self):
+        from azure.mgmt.network import NetworkManagementClient # type: ignore
+        credential = self.credential
+        with self._client_lock:
+            return NetworkManagementClient(credential, self.SUBSCRIPTION_ID)
+
+    def get_all_vms(self, provider_config, vcpus, location, catalog=None):
+        if catalog is None:
+            catalog = CompiledCatalog({'providers': {'azure': provider_config}})
+
+        instance_filter = InstanceFilter.coerce(vcpus)
+        target_region_names = catalog.regions_for('azure', location)
 
         vms = [
             {
                 'provider': 'azure',
                 'instance_type': instance_type["name"],
                 'vcpus': instance_type['vcpus'],
+                'ram': instance_type.get('ram', 0),
                 'region': region_name,
                 'market': 'spot'
             }
-            for region_name, region_data in regions_to_process.items()
-            for instance_type in region_data.get('instance_types', [])
-            if instance_type.get("vcpus", 0) == vcpus
+            for region_name in target_region_names
+            for instance_type in catalog.select('azure', region_name, instance_filter)
         ]
 
         return vms
     
 
-    def create_fleet(self, instances, allocation_strategy, target_capacity, tag='MultiCloud'):
+    def create_fleet(self, instances, allocation_strategy, target_capacity, tag='MultiCloud', capacity_unit='instance', on_ready=None):
+        with tracer.span('azure.create_fleet', region=instances[0].region, group_size=len(instances), target_capacity=target_capacity) as span:
+            fleet_name, fleet_vms, errors = self._create_fleet(instances, allocation_strategy, target_capacity, tag, capacity_unit, on_ready)
+            span.set(fleet_id=fleet_name, instances=len(fleet_vms or []))
+            return fleet_name, fleet_vms, errors
+
+    def _create_fleet(self, instances, allocation_strategy, target_capacity, tag, capacity_unit, on_ready):
         if allocation_strategy == 'lowest-price':
             allocation_strategy = 'LowestPrice'
         elif allocation_strategy == 'capacity-optimized':
@@ -72,6 +101,11 @@ class AzureProvider(AbstractCloudProvider):
         
         overrides = self._instance_template_config(instances)
 
+        if capacity_unit != 'instance':
+            # O vmSizesProfile não aceita peso por tamanho: a meta em unidades vira
+            # quantidade de VMs pelo peso da opção mais barata por unidade do grupo.
+            target_capacity = math.ceil(target_capacity / instances[0].weight)
+
         fleet_parameters = {
             "location": region,
             "properties": {
@@ -154,37 +188,43 @@ class AzureProvider(AbstractCloudProvider):
         }
 
         try:
-            fleet_name = f'{self.FLEET_NAME}-{self.FLEET_NUM}'
+            fleet_name = self._next_fleet_name()
             logging.info(f"Iniciando criação da frota '{fleet_name}' no Azure...")
 
             
-            try:
-                poller = self.fleet_client.fleets.begin_create_or_update(
-                    self.RESOURCE_GROUP_NAME, 
-                    fleet_name, 
-                    fleet_parameters
-                )
-                fleet_result = poller.result()
-                logging.info(f"Frota '{fleet_name}' provisionada com sucesso.")
-            except Exception as e:
-                logging.warning(f"Falha parcial na frota '{fleet_name}': {e.message}")
+            with tracer.span('azure.fleet_poller', region=region, fleet_name=fleet_name) as poller_span:
+                try:
+                    poller = self.fleet_client.fleets.begin_create_or_update(
+                        self.RESOURCE_GROUP_NAME, 
+                        fleet_name, 
+                        fleet_parameters
+                    )
+                    fleet_result = poller.result()
+                    logging.info(f"Frota '{fleet_name}' provisionada com sucesso.")
+                except Exception as e:
+                    poller_span.set(partial_failure=str(e))
+                    logging.warning(f"Falha parcial na frota '{fleet_name}': {e.message}")
 
 
             self.fleet_names.append(fleet_name)
             logging.info(f"Frota '{fleet_name}' provisionada. Buscando VMs associadas...")
 
-            instance_details_map = self._get_azure_vm_details(tag, fleet_name)
+            with tracer.span('azure.vm_details', region=region, fleet_name=fleet_name) as details_span:
+                instance_details_map = self._get_azure_vm_details(tag, fleet_name)
+                details_span.set(instances=len(instance_details_map))
             
             fleet_vms = []
 
             for vm_name, details in instance_details_map.items():
                 price = 0
+                weight = 1
                 for inst in instances:
                     instance_type = inst.instance_type
                     instance_type = instance_type.replace(" ", "_")
                     instance_type = 'Standard_' + instance_type
                     if instance_type == details['instance_type']:
                         price = inst.price
+                        weight = inst.weight
 
                 fleet_vms.append(
                     FleetVmSpec(
@@ -195,12 +235,16 @@ class AzureProvider(AbstractCloudProvider):
                         price=price,
                         public_ip=details['public_ip'],
                         private_ip=details['private_ip'],
+                        weight=weight,
+                        region=region,
                     )
                 )
 
-    
-            
-            self.FLEET_NUM += 1
+            # O Compute Fleet só informa as VMs depois do poller: todas ficam prontas juntas.
+            if on_ready:
+                for vm in fleet_vms:
+                    on_ready(vm.weight)
+
             return fleet_name, fleet_vms, [] 
 
         except Exception as e:
@@ -208,16 +252,87 @@ class AzureProvider(AbstractCloudProvider):
 
     
 
-    def delete_fleet(self):
-        for fleet_name in self.fleet_names:
-            response = self.fleet_client.fleets.begin_delete(
-                resource_group_name=self.RESOURCE_GROUP_NAME,
-                fleet_name=fleet_name,
-            ).result()
-            logging.info(f'{fleet_name} deletada com sucesso...')
-        logging.info(f'{len(self.fleet_names)} Fleets deletadas com sucesso!')
+    def delete_fleet(self, fleets=None, tag='MultiCloud'):
+        # Junta as frotas desta execução, as do FleetStateStore (fleets:
+        # {fleet_id: [FleetVmSpec]}) e as encontradas pela tag na listagem
+        # paginada do resource group; dispara todos os begin_delete antes de
+        # esperar qualquer um. Retorna {região: relatório}.
+        with tracer.span('azure.teardown', known=len(fleets or {})) as span:
+            report = self._delete_fleets(fleets, tag)
+            span.set(
+                found=sum(r["found"] for r in report.values()),
+                terminated=sum(r["terminated"] for r in report.values()),
+                errors=sum(1 for r in report.values() if r["error"])
+            )
+            return report
+
+    def _delete_fleets(self, fleets, tag):
+        regions_by_fleet = {fleet_name: None for fleet_name in self.fleet_names}
+        for fleet_name, vms in (fleets or {}).items():
+            regions_by_fleet[fleet_name] = vms[0].region if vms else regions_by_fleet.get(fleet_name)
+        try:
+            for fleet in self.fleet_client.fleets.list_by_resource_group(self.RESOURCE_GROUP_NAME):
+                if (fleet.tags or {}).get("key") == tag:
+                    regions_by_fleet[fleet.name] = fleet.location
+        except HttpResponseError as e:
+            logging.warning(f"Não foi possível listar as frotas do resource group: {e}")
+
+        started_at = time.monotonic()
+        report = {}
+        pollers = []
+        for fleet_name, region in regions_by_fleet.items():
+            region_report = report.setdefault(region or 'desconhecida', {"found": 0, "terminated": 0, "seconds": 0.0, "error": None})
+            region_report["found"] += 1
+            try:
+                pollers.append((fleet_name, region_report, self.fleet_client.fleets.begin_delete(
+                    resource_group_name=self.RESOURCE_GROUP_NAME,
+                    fleet_name=fleet_name,
+                )))
+            except ResourceNotFoundError:
+                region_report["terminated"] += 1
+            except HttpResponseError as e:
+                region_report["error"] = str(e)
+                logging.error(f"Falha ao deletar a frota '{fleet_name}': {e}")
+
+        for fleet_name, region_report, poller in pollers:
+            try:
+                poller.result()
+                region_report["terminated"] += 1
+                logging.info(f'{fleet_name} deletada com sucesso...')
+            except ResourceNotFoundError:
+                region_report["terminated"] += 1
+            except HttpResponseError as e:
+                region_report["error"] = str(e)
+                logging.error(f"Falha ao deletar a frota '{fleet_name}': {e}")
+            region_report["seconds"] = round(time.monotonic() - started_at, 3)
+
+        logging.info(f'{sum(r["terminated"] for r in report.values())} Fleets deletadas com sucesso!')
         self.fleet_names.clear()
+        return report
+
 
+    def terminate_instances(self, vms):
+        # Encerra VMs específicas (ex.: excedente de um provisionamento paralelo)
+        # e retorna os ids efetivamente encerrados. O FleetVmSpec guarda o vm_id,
+        # então o nome da VM é resolvido pela listagem.
+        targets = {vm.instance_id for vm in vms}
+        pollers = []
+        for vm in self.compute_client.virtual_machines.list_all():
+            if vm.vm_id in targets:
+                try:
+                    pollers.append((vm.vm_id, vm.name, self.compute_client.virtual_machines.begin_delete(self.RESOURCE_GROUP_NAME, vm.name)))
+                except HttpResponseError as e:
+                    logging.error(f"Falha ao encerrar a VM {vm.name}: {e}")
+
+        terminated = []
+        for vm_id, vm_name, poller in pollers:
+            try:
+                poller.result()
+                terminated.append(vm_id)
+                logging.info(f"VM {vm_name} encerrada.")
+            except HttpResponseError as e:
+                logging.error(f"Falha ao encerrar a VM {vm_name}: {e}")
+        return terminated
 
 
     def _get_azure_vm_details(self, tag, fleet_name):
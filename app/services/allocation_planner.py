@@ -0,0 +1,88 @@
+import logging
+import math
+from dataclasses import dataclass, field
+
+
+@dataclass
+class AllocationPlan:
+    target_capacity: float
+    # (índice do grupo, grupo, unidades), do menor para o maior custo por unidade
+    allocations: list = field(default_factory=list)
+    expected_cost: float = 0.0
+
+    @property
+    def planned_capacity(self):
+        return sum(units for _, _, units in self.allocations)
+
+    @property
+    def shortfall(self):
+        return max(0, self.target_capacity - self.planned_capacity)
+
+
+class AllocationPlanner:
+    # Divide a capacidade alvo entre os grupos de preço minimizando o custo
+    # esperado, limitado pela capacidade estimada de cada grupo e por um teto por
+    # provedor. Cada grupo pertence a um único provedor, então as restrições são
+    # aninhadas (grupo dentro de provedor): preencher em ordem de custo por
+    # unidade é a solução ótima do fluxo de custo mínimo equivalente, em O(n log n).
+    # As alocações são sempre unidades inteiras: o EC2 Fleet (TotalTargetCapacity)
+    # e o Azure (spotPriorityProfile.capacity) não aceitam frações.
+    def __init__(self, group_capacity=None, provider_limits=None, max_group_share=None, estimator=None):
+        # group_capacity: unidades esperadas por grupo quando o estimator não sabe
+        # (None = ilimitado). max_group_share: fração máxima da meta por grupo.
+        self.group_capacity = group_capacity
+        self.provider_limits = {name: math.floor(limit) for name, limit in (provider_limits or {}).items()}
+        self.max_group_share = max_group_share
+        self.estimator = estimator
+
+    def capacities(self, groups, target_capacity):
+        # {índice do grupo: unidades estimadas}, no formato aceito por plan().
+        share_cap = math.ceil(target_capacity * self.max_group_share) if self.max_group_share else math.inf
+        default = self.group_capacity if self.group_capacity is not None else math.inf
+        if self.estimator is None:
+            return dict.fromkeys(range(len(groups)), max(0, min(default, share_cap)))
+        return {
+            index: max(0, min(default if estimate is None else estimate, share_cap))
+            for index, estimate in enumerate(map(self.estimator, groups))
+        }
+
+    def capacity_of(self, group, target_capacity):
+        return self.capacities([group], target_capacity)[0]
+
+    @staticmethod
+    def unit_cost(group):
+        return min([vm.price / vm.weight for vm in group])
+
+    def plan(self, groups, target_capacity, capacities=None):
+        # capacities: {índice do grupo: unidades} substitui as estimativas, ex.: o
+        # que sobrou de cada grupo após uma rodada de provisionamento.
+        if capacities is None:
+            capacities = self.capacities(groups, target_capacity)
+        # Grupos sem capacidade estimada nem entram na ordenação; o custo por
+        # unidade é o trecho mais caro do plano com milhares de grupos.
+        unit_costs = {
+            index: min([vm.price / vm.weight for vm in groups[index]])
+            for index, capacity in capacities.items() if capacity >= 1
+        }
+        provider_left = dict(self.provider_limits)
+        plan = AllocationPlan(target_capacity)
+        remaining = math.ceil(target_capacity)
+
+        for index in sorted(unit_costs, key=unit_costs.__getitem__):
+            if remaining <= 0:
+                break
+            group = groups[index]
+            provider_name = group[0].provider
+            units = math.floor(min(remaining, capacities[index], provider_left.get(provider_name, math.inf)))
+            if units <= 0:
+                continue
+
+            plan.allocations.append((index, group, units))
+            plan.expected_cost += units * unit_costs[index]
+            remaining -= units
+            if provider_name in provider_left:
+                provider_left[provider_name] -= units
+
+        if plan.shortfall:
+            logging.warning(f"AllocationPlanner: capacidade estimada insuficiente; faltam {plan.shortfall} de {target_capacity} unidades.")
+        return plan
@@ -1,79 +1,314 @@
 # app/services/catalog_service.py
 
+import collections
 import concurrent.futures
+import heapq
+import itertools
 import logging
+import queue
+import threading
+import time
 from ..core.models import VMSpec
+from ..core.catalog import CompiledCatalog
+from .price_grouping import MAX_REL_DIFF, PriceColumnsBuilder
+from .top_k import RegionTopK
+from .cost_ranking import CostRanker
+from .region_scheduler import CatalogProgress, RegionScheduler
+from ..core.tracing import tracer
 
 class CatalogService:
-    def __init__(self, providers, pricing_client):
+    def __init__(self, providers, pricing_client, price_history=None, capacity_unit='instance', max_concurrency=32, snapshot_store=None):
         self.providers = providers
         self.pricing_client = pricing_client
+        self.price_history = price_history
+        self.snapshot_store = snapshot_store
+        self.ranker = CostRanker(capacity_unit)
+        self.scheduler = RegionScheduler(max_concurrency)
+        self.progress = CatalogProgress({})
 
-    def _fetch_provider_prices(self, provider_name, provider_config, vcpus, location, limit):
-        if provider_name== 'aws':
-            limit = 99999
-        provider_instance = self.providers.get(provider_name)
-        if not provider_instance:
-            logging.info(f"THREAD-{provider_name.upper()}: Provedor não encontrado. Pulando.")
-            return []
+    def _price_region(self, provider_name, region_name, candidates, limit, max_price=None, on_vm=None):
+        with tracer.span('catalog.region', provider=provider_name, region=region_name, candidates=len(candidates)) as span:
+            key = (provider_name, region_name)
+            self.progress.region_started(key)
+            selected = RegionTopK(limit, max_price)
+            unweighted = 0
 
-        for region_name, region_data in provider_config['regions'].items():
-            flat_instance_list = []
-            for item in region_data['instance_types']:
-                if isinstance(item, list):
-                    flat_instance_list.extend(item)
-                else:
-                    flat_instance_list.append(item)
-            region_data['instance_types'] = flat_instance_list
-        
-        candidates = provider_instance.get_all_vms(provider_config, vcpus, location)
-        
-        vms_with_prices = self.pricing_client.get_prices_for(candidates)
+            prices = self.pricing_client.iter_prices_for(candidates)
+            try:
+                for vm in prices:
+                    if not self.ranker.weigh(vm):
+                        unweighted += 1
+                        continue
+                    self.progress.vm_priced()
+                    if on_vm is not None:
+                        on_vm(vm)
+                    selected.push(vm)
+                    if selected.satisfied([key]):
+                        logging.info(
+                            f"CATALOG SERVICE: {provider_name.upper()}/{region_name} com {selected.limit} VMs até {max_price} após "
+                            f"{selected.seen} de {len(candidates)} cotações. Interrompendo a cotação."
+                        )
+                        break
+            finally:
+                # Fechar o gerador cancela as cotações que ainda estão na fila.
+                prices.close()
 
-        return vms_with_prices
+            if unweighted:
+                logging.warning(f"CATALOG SERVICE: {unweighted} VMs de {provider_name.upper()}/{region_name} sem '{self.ranker.unit}' no catálogo ficaram fora do ranking.")
+            span.set(priced=selected.seen, selected=len(selected), unweighted=unweighted)
+            return selected.items()
 
+    def _provider_candidates(self, provider_name, catalog, vcpus, location):
+        provider_instance = self.providers[provider_name]
+        return provider_instance.get_all_vms(catalog['providers'][provider_name], vcpus, location, catalog)
 
-    def build_catalog_in_parallel(self, catalog_config, vcpus, location, group_by_price, limit):
-        all_priced_vms = []
-        
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future_to_provider = {
-                executor.submit(self._fetch_provider_prices, provider_name, provider_config, vcpus, location, limit): provider_name
-                for provider_name, provider_config in catalog_config['providers'].items()
-                if provider_name in self.providers
-            }
-
-            for future in concurrent.futures.as_completed(future_to_provider):
-                provider_name = future_to_provider[future]
-                try:
-                    result = future.result() 
-                    if result:
-                        all_priced_vms.extend(result)
-                except Exception as exc:
-                    logging.warning(f"CATALOG SERVICE: Exceção na thread de {provider_name.upper()}: {exc}")
+    def _region_tasks(self, catalog, vcpus, location):
+        # Lista os candidatos de cada provedor (sem rede) e os divide por região;
+        # cada (provedor, região) vira uma tarefa do RegionScheduler.
+        tasks = {}
+        for provider_name in catalog['providers']:
+            if provider_name not in self.providers:
+                logging.info(f"CATALOG SERVICE: Provedor {provider_name.upper()} não selecionado. Pulando.")
+                continue
+            try:
+                candidates = self._provider_candidates(provider_name, catalog, vcpus, location)
+            except Exception as exc:
+                logging.warning(f"CATALOG SERVICE: Falha ao listar as VMs de {provider_name.upper()}: {exc}")
+                continue
+            tasks.update(RegionScheduler.partition(provider_name, candidates))
+
+        self.progress = CatalogProgress(tasks)
+        logging.info(
+            f"CATALOG SERVICE: {self.progress.quotes_total} cotações em {len(tasks)} regiões "
+            f"(até {self.scheduler.max_concurrency} regiões em paralelo)."
+        )
+        return tasks
+
+    def _snapshot_query(self, vcpus, location, group_by_price, limit, max_price):
+        return self.snapshot_store.query_hash(
+            sorted(self.providers), type(self.pricing_client).__name__, getattr(self.pricing_client, 'base_url', None),
+            repr(vcpus), location, bool(group_by_price), limit, max_price, self.ranker.unit, self.price_history is not None
+        )
+
+    def build_catalog_in_parallel(self, catalog_config, vcpus, location, group_by_price, limit, max_price=None):
+        with tracer.span('catalog.build', providers=sorted(self.providers), location=location, vcpus=str(vcpus), group_by_price=bool(group_by_price), limit=limit) as span:
+            result = self._build_catalog(catalog_config, vcpus, location, group_by_price, limit, max_price, span)
+            span.set(options=len(result), vms=sum(len(group) for group in result) if group_by_price else len(result))
+            return result
 
-        logging.info("CATALOG SERVICE: Todas as threads finalizaram. Consolidando resultados...")
+    def _build_catalog(self, catalog_config, vcpus, location, group_by_price, limit, max_price, span):
+        all_priced_vms = PriceColumnsBuilder()
+        catalog = CompiledCatalog.from_config(catalog_config)
+
+        if self.snapshot_store is not None:
+            query_hash = self._snapshot_query(vcpus, location, group_by_price, limit, max_price)
+            cached = self.snapshot_store.load(catalog, query_hash)
+            span.set(snapshot_hit=cached is not None)
+            if cached is not None:
+                return cached
+
+        tasks = self._region_tasks(catalog, vcpus, location)
+
+        future_to_region = self.scheduler.submit(tasks, self._price_region, limit, max_price)
+        for future in concurrent.futures.as_completed(future_to_region):
+            key = future_to_region[future]
+            try:
+                result = future.result()
+                if result:
+                    all_priced_vms.extend(result)
+                self.progress.region_finished(key)
+            except Exception as exc:
+                logging.warning(f"CATALOG SERVICE: Exceção ao cotar {key[0].upper()}/{key[1]}: {exc}")
+                self.progress.region_finished(key, failed=True)
+
+        logging.info("CATALOG SERVICE: Todas as regiões finalizaram. Consolidando resultados...")
         
-        if not all_priced_vms:
+        if not all_priced_vms.vms:
             logging.info("CATALOG SERVICE: Nenhum preço foi retornado.")
             return []
 
-        sorted_all_priced_vms = sorted(all_priced_vms, key=lambda vm: vm.price)
+        ranked = all_priced_vms.ranked()
+        sorted_all_priced_vms, columns = ranked if ranked is not None else (self.ranker.rank(all_priced_vms.vms), None)
         if not group_by_price:
-            return sorted_all_priced_vms
+            result = sorted_all_priced_vms
         else:
-            grouped_vms = self.group_by_price(sorted_all_priced_vms)
-            return grouped_vms
+            result = self.group_by_price(sorted_all_priced_vms, columns)
+            if self.price_history is not None:
+                result = self.rank_groups_by_expected_price(result)
+
+        if self.snapshot_store is not None:
+            self.snapshot_store.save(catalog, query_hash, result)
+        return result
+
+    def rank_groups_by_expected_price(self, groups):
+        # Ordena pelo preço esperado (mediana recente do histórico local) em vez
+        # do preço instantâneo; sem histórico, vale o preço atual da VM.
+        def expected_group_price(group):
+            return min(self.price_history.expected_price(vm) / vm.weight for vm in group)
+
+        ranked = sorted(groups, key=expected_group_price)
+        logging.info("CATALOG SERVICE: Grupos ordenados pelo preço esperado do histórico.")
+        return ranked
+
+    def stream_groups(self, catalog_config, vcpus, location, deadline_seconds=None, limit=None, max_price=None):
+        # Versão em streaming do catálogo agrupado: os preços chegam em uma fila e
+        # os grupos de um provedor são finalizados assim que todas as suas cotações
+        # terminam. O primeiro grupo é liberado quando todos os provedores reportaram
+        # ou quando o deadline passa (o que vier primeiro); grupos finalizados depois
+        # entram na ordem de preço dos que ainda não foram entregues.
+        catalog = CompiledCatalog.from_config(catalog_config)
+        if self.snapshot_store is not None:
+            query_hash = self._snapshot_query(vcpus, location, True, limit, max_price)
+            cached = self.snapshot_store.load(catalog, query_hash)
+            if cached is not None:
+                yield from cached
+                return
+
+        events = queue.Queue()
+        start_time = time.time()
+        deadline = start_time + deadline_seconds if deadline_seconds is not None else None
+
+        tasks = self._region_tasks(catalog, vcpus, location)
+        pending_regions = collections.Counter(provider_name for provider_name, _ in tasks)
+        provider_names = sorted(pending_regions)
+        # Mede até o primeiro grupo liberado, a latência que importa no streaming.
+        stream_span = tracer.start_span('catalog.stream', providers=provider_names, regions=len(tasks), deadline_seconds=deadline_seconds)
+        future_to_region = self.scheduler.submit(tasks, self._stream_region_prices, events, limit, max_price)
+
+        pending_providers = set(provider_names)
+        received = {name: RegionTopK(limit) for name in provider_names}
+        ready_groups = []
+        sequence = itertools.count()
+        confident = False
+        first_group_logged = False
+        yielded = []
+
+        def finalize(provider_name):
+            vms = sorted(received[provider_name].items(), key=lambda vm: (vm.region, vm.unit_price))
+            received[provider_name] = RegionTopK(limit)
+            for group in self.group_by_price(vms) if vms else []:
+                heapq.heappush(ready_groups, (group[0].unit_price, next(sequence), group))
+
+        def handle(event):
+            kind, provider_name, payload = event
+            if kind == 'vm':
+                received[provider_name].push(payload)
+                return
+
+            pending_regions[provider_name] -= 1
+            if pending_regions[provider_name] == 0:
+                pending_providers.discard(provider_name)
+                finalize(provider_name)
+                logging.info(f"CATALOG SERVICE (stream): {provider_name.upper()} finalizado em {time.time() - start_time:.2f}s.")
+
+        def save_snapshot():
+            groups = sorted(yielded + [group for _, _, group in ready_groups], key=lambda group: group[0].unit_price)
+            self.snapshot_store.save(catalog, query_hash, groups)
+
+        def drain_and_save():
+            # O consumidor parou antes do fim (ex.: meta atingida): as cotações em
+            # andamento terminam em segundo plano e o snapshot é salvo completo.
+            try:
+                while pending_providers:
+                    handle(events.get())
+                save_snapshot()
+            except Exception as exc:
+                logging.warning(f"CATALOG SERVICE (stream): snapshot não salvo: {exc}")
+
+        try:
+            while True:
+                if not confident:
+                    if not pending_providers:
+                        confident = True
+                    elif deadline is not None and time.time() >= deadline:
+                        logging.info(f"CATALOG SERVICE (stream): deadline de {deadline_seconds}s atingido com {len(pending_providers)} provedor(es) pendente(s).")
+                        for provider_name in pending_providers:
+                            finalize(provider_name)
+                        confident = True
+
+                if confident:
+                    # Incorpora o que já chegou antes de escolher o próximo grupo.
+                    while True:
+                        try:
+                            handle(events.get_nowait())
+                        except queue.Empty:
+                            break
+
+                    if ready_groups:
+                        _, _, group = heapq.heappop(ready_groups)
+                        if not first_group_logged:
+                            logging.info(f"CATALOG SERVICE (stream): primeiro grupo liberado em {time.time() - start_time:.2f}s.")
+                            first_group_logged = True
+                            stream_span.set(pending_providers=len(pending_providers), groups_ready=len(ready_groups) + 1)
+                            stream_span.end()
+                        yielded.append(group)
+                        yield group
+                        continue
+
+                    if not pending_providers:
+                        stream_span.end()
+                        if self.snapshot_store is not None:
+                            save_snapshot()
+                        return
+
+                    handle(events.get())
+                    continue
+
+                timeout = max(0.0, deadline - time.time()) if deadline is not None else None
+                try:
+                    handle(events.get(timeout=timeout))
+                except queue.Empty:
+                    pass
+        except GeneratorExit:
+            # As regiões que ainda não começaram são canceladas; sem elas o
+            # catálogo fica incompleto e não vira snapshot.
+            cancelled = RegionScheduler.cancel(future_to_region)
+            if cancelled:
+                logging.info(f"CATALOG SERVICE (stream): {len(cancelled)} regiões canceladas após o consumidor parar.")
+            elif self.snapshot_store is not None:
+                threading.Thread(target=drain_and_save, name="CatalogStreamSnapshot", daemon=True).start()
+            raise
+
+    def close(self):
+        self.scheduler.close()
+
+    def _stream_region_prices(self, provider_name, region_name, candidates, events, limit=None, max_price=None):
+        failed = False
+        try:
+            self._price_region(
+                provider_name, region_name, candidates, limit, max_price,
+                on_vm=lambda vm: events.put(('vm', provider_name, vm))
+            )
+        except Exception as exc:
+            failed = True
+            logging.warning(f"CATALOG SERVICE (stream): Exceção ao cotar {provider_name.upper()}/{region_name}: {exc}")
+        finally:
+            self.progress.region_finished((provider_name, region_name), failed)
+            events.put(('done', provider_name, region_name))
+
+    def group_by_price(self, instances_sorted, columns=None):
+        # columns: PriceColumns já montadas na mesma ordem (PriceColumnsBuilder);
+        # sem elas vale o laço.
+        instances_sorted = list(instances_sorted)
+        with tracer.span('catalog.group', vms=len(instances_sorted), vectorized=columns is not None) as span:
+            groups = None
+            if columns is not None:
+                bounds = columns.group_bounds(MAX_REL_DIFF)
+                if bounds is not None:
+                    groups = [instances_sorted[start:end] for start, end in zip(bounds, bounds[1:])]
+            if groups is None:
+                groups = self._group_by_price_loop(instances_sorted)
+            span.set(groups=len(groups))
+            return groups
 
-    def group_by_price(self, instances_sorted):
-        MAX_REL_DIFF = 0.3
+    def _group_by_price_loop(self, instances_sorted):
         groups = []
         current_group = []
         current_region = None
         current_provider = None
 
         for vm in instances_sorted:
-            price = vm.price
+            price = vm.unit_price
             region = vm.region
             provider = vm.provider
 
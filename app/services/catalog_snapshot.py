@@ -0,0 +1,144 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+
+from ..core.models import VMSpec
+
+DEFAULT_SNAPSHOT_DIR = './cache/catalog_snapshots'
+
+# Cabeçalho: magic, versão, flags, criado_em, ttl, sha256 do vm_catalog.yaml,
+# sha256 da consulta, nº de VMs, nº de preços por AZ, tamanho da tabela de strings.
+HEADER = struct.Struct('<4sHHdd32s32sIII')
+MAGIC = b'VMCS'
+VERSION = 1
+FLAG_GROUPED = 1
+
+# Uma VM: ids na tabela de strings (provedor, tipo, região, AZ), preço, vCPUs,
+# RAM, peso, posição/quantidade dos seus preços por AZ e índice do grupo (-1 sem grupo).
+VM_RECORD = struct.Struct('<IIIIdIIdIIi')
+AZ_RECORD = struct.Struct('<Id')
+
+
+class CatalogSnapshotStore:
+    # Persiste o catálogo já cotado (lista ordenada ou grupos) em um arquivo
+    # binário por consulta e o lê de volta via mmap. Um snapshot só é usado se o
+    # vm_catalog.yaml não mudou e ainda está dentro do TTL dos preços.
+    def __init__(self, root=DEFAULT_SNAPSHOT_DIR, ttl_seconds=300):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def config_hash(catalog):
+        if catalog.source_hash:
+            return catalog.source_hash
+        return hashlib.sha256(json.dumps(catalog.config, sort_keys=True, default=str).encode()).hexdigest()
+
+    @staticmethod
+    def query_hash(*parts):
+        return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+    def _path_for(self, query_hash):
+        return os.path.join(self.root, f'{query_hash[:16]}.bin')
+
+    def save(self, catalog, query_hash, options):
+        grouped = bool(options) and isinstance(options[0], list)
+        groups = options if grouped else [options]
+
+        strings = {}
+
+        def string_id(value):
+            return strings.setdefault(value or '', len(strings))
+
+        vm_records = bytearray()
+        az_records = bytearray()
+        az_count = 0
+        for group_index, group in enumerate(groups):
+            for vm in group:
+                for az, price in vm.az_prices:
+                    az_records += AZ_RECORD.pack(string_id(az), price)
+                vm_records += VM_RECORD.pack(
+                    string_id(vm.provider), string_id(vm.instance_type), string_id(vm.region), string_id(vm.region_az),
+                    vm.price, vm.vcpus, vm.ram, vm.weight, az_count, len(vm.az_prices),
+                    group_index if grouped else -1
+                )
+                az_count += len(vm.az_prices)
+
+        string_table = json.dumps(list(strings)).encode()
+        header = HEADER.pack(
+            MAGIC, VERSION, FLAG_GROUPED if grouped else 0, time.time(), self.ttl_seconds,
+            bytes.fromhex(self.config_hash(catalog)), bytes.fromhex(query_hash),
+            len(vm_records) // VM_RECORD.size, az_count, len(string_table)
+        )
+
+        path = self._path_for(query_hash)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(header + vm_records + az_records + string_table)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"CatalogSnapshotStore: não foi possível salvar '{path}': {e}")
+            return
+        logging.info(f"CatalogSnapshotStore: {len(vm_records) // VM_RECORD.size} VMs salvas em '{path}'.")
+
+    def load(self, catalog, query_hash):
+        # Retorna a lista/grupos salvos, ou None se não houver snapshot válido.
+        path = self._path_for(query_hash)
+        try:
+            with open(path, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return self._decode(mapped, catalog, query_hash, path)
+        except (OSError, ValueError, struct.error) as e:
+            if not isinstance(e, FileNotFoundError):
+                logging.warning(f"CatalogSnapshotStore: ignorando '{path}': {e}")
+            return None
+
+    def _decode(self, mapped, catalog, query_hash, path):
+        magic, version, flags, created_at, ttl, config_hash, stored_query, vm_count, az_count, strings_size = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or version != VERSION or stored_query != bytes.fromhex(query_hash):
+            return None
+        if config_hash != bytes.fromhex(self.config_hash(catalog)):
+            logging.info(f"CatalogSnapshotStore: '{path}' foi gerado a partir de outro vm_catalog.yaml.")
+            return None
+        age = time.time() - created_at
+        if age > min(ttl, self.ttl_seconds):
+            logging.info(f"CatalogSnapshotStore: '{path}' expirado ({age:.0f}s).")
+            return None
+
+        view = memoryview(mapped)
+        try:
+            vm_start = HEADER.size
+            az_start = vm_start + vm_count * VM_RECORD.size
+            strings_start = az_start + az_count * AZ_RECORD.size
+            strings = json.loads(bytes(view[strings_start:strings_start + strings_size]))
+            az_prices = [(strings[az_id], price) for az_id, price in AZ_RECORD.iter_unpack(view[az_start:strings_start])]
+
+            groups = []
+            for provider_id, type_id, region_id, az_id, price, vcpus, ram, weight, az_offset, az_total, group_index in VM_RECORD.iter_unpack(view[vm_start:az_start]):
+                vm = VMSpec(
+                    provider=strings[provider_id],
+                    instance_type=strings[type_id],
+                    region=strings[region_id],
+                    region_az=strings[az_id],
+                    price=price,
+                    az_prices=tuple(az_prices[az_offset:az_offset + az_total]),
+                    vcpus=vcpus,
+                    ram=ram,
+                    weight=weight
+                )
+                group_index = max(group_index, 0)
+                while len(groups) <= group_index:
+                    groups.append([])
+                groups[group_index].append(vm)
+        finally:
+            view.release()
+
+        logging.info(f"CatalogSnapshotStore: catálogo carregado de '{path}' ({vm_count} VMs, {age:.0f}s).")
+        if flags & FLAG_GROUPED:
+            return groups
+        return groups[0] if groups else []
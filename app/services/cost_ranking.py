@@ -0,0 +1,30 @@
+CAPACITY_UNITS = ('instance', 'vcpu', 'memory')
+
+
+class CostRanker:
+    # Converte cada VM em unidades de capacidade (instâncias, vCPUs ou GiB de RAM)
+    # e ordena pelo custo por unidade, como o WeightedCapacity do EC2 Fleet. Com
+    # 'instance' todas pesam 1 e a ordem é a do preço absoluto.
+    def __init__(self, unit='instance'):
+        if unit not in CAPACITY_UNITS:
+            raise ValueError(f"Unidade de capacidade desconhecida: '{unit}'. Opções: {CAPACITY_UNITS}")
+        self.unit = unit
+
+    def weight_of(self, vm):
+        if self.unit == 'vcpu':
+            return vm.vcpus
+        if self.unit == 'memory':
+            return vm.ram / 1024
+        return 1
+
+    def weigh(self, vm):
+        # Define vm.weight; retorna False se o catálogo não informa a dimensão
+        # pedida (ex.: tipo sem 'ram'), caso em que a VM não pode ser ranqueada.
+        weight = self.weight_of(vm)
+        if weight <= 0:
+            return False
+        vm.weight = weight
+        return True
+
+    def rank(self, vms):
+        return sorted(vms, key=lambda vm: vm.unit_price)
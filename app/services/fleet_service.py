@@ -1,22 +1,94 @@
+import concurrent.futures
+import itertools
 import logging
+import math
+import threading
+import time
+from collections import defaultdict
+
+from ..clients.fleet_state import RUNNING, TERMINATED
+from ..core.tracing import tracer
+
+
+class _HedgedLaunch:
+    # Uma chamada create_fleet em andamento no modo com hedge; ready é somado
+    # pelo callback on_ready do provedor conforme as VMs ficam prontas.
+    def __init__(self, group, units, hedge=False):
+        self.group = group
+        self.units = units
+        self.hedge = hedge
+        self.hedged = False
+        self.ready = 0
+        self.started_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add_ready(self, units):
+        with self._lock:
+            self.ready += units
+
 
 class FleetService:
-    def __init__(self, providers):
+    def __init__(self, providers, capacity_unit='instance', parallel_groups=1, planner=None, hedge_after=None, hedge_fraction=0.5, state_store=None, fulfillment=None):
         self.providers = providers
         self.fleets = {}
+        # Com 'vcpu' ou 'memory', target_capacity é medido em unidades (vCPUs ou
+        # GiB) e cada VM conta pelo seu weight, como no WeightedCapacity do EC2 Fleet.
+        self.capacity_unit = capacity_unit
+        # Quantos grupos do catálogo são provisionados ao mesmo tempo em
+        # provision_fleet_multi_cloud; 1 mantém o modo sequencial.
+        self.parallel_groups = max(1, parallel_groups)
+        # AllocationPlanner opcional: divide a meta entre os grupos pelo menor custo
+        # esperado em vez de pedir tudo ao grupo mais barato.
+        self.planner = planner
+        # Hedge no modo sequencial: se uma frota não tiver hedge_fraction da
+        # capacidade pedida pronta em hedge_after segundos, o próximo grupo é
+        # acionado com o que falta (None desliga).
+        self.hedge_after = hedge_after
+        self.hedge_fraction = hedge_fraction
+        self.last_report = None
+        # FleetStateStore opcional: cada frota é gravada assim que sobe, e o
+        # delete_fleet desmonta a partir dele as frotas desta instância; o que
+        # sobrou de uma execução anterior que caiu só com include_previous_runs.
+        self.state_store = state_store
+        self._recorded_fleet_ids = set()
+        # FulfillmentRanker opcional: registra o resultado de cada create_fleet e
+        # reordena os grupos pelo custo esperado por unidade entregue.
+        self.fulfillment = fulfillment
 
 
     def provision_fleet_multi_cloud(self, sorted_groups, target_capacity, allocation_strategy):
+        if self.planner is not None:
+            mode, provision = 'planned', self._provision_planned
+        elif self.parallel_groups > 1:
+            mode, provision = 'parallel', self._provision_parallel
+        elif self.hedge_after is not None:
+            mode, provision = 'hedged', self._provision_hedged
+        else:
+            mode, provision = 'sequential', self._provision_sequential
+
+        with tracer.span('fleet.provision', mode=mode, target_capacity=target_capacity, capacity_unit=self.capacity_unit) as span:
+            if self.fulfillment is not None and isinstance(sorted_groups, list):
+                # Um iterador (stream_groups) segue na ordem de chegada: ordenar
+                # exigiria esperar o catálogo inteiro.
+                sorted_groups = self.fulfillment.rank(sorted_groups)
+            provisioned_fleets_this_run = provision(sorted_groups, target_capacity, allocation_strategy)
+            self._trace_result(span, provisioned_fleets_this_run, target_capacity)
+            return provisioned_fleets_this_run
 
+    def _provision_sequential(self, sorted_groups, target_capacity, allocation_strategy):
         provisioned_fleets_this_run = {}
         capacity_fulfilled = 0
-        groups_to_try = list(sorted_groups) 
+        # Aceita lista ou iterador (ex.: CatalogService.stream_groups); os grupos
+        # são consumidos sob demanda, só quando a capacidade ainda não foi atingida.
+        groups_to_try = iter(sorted_groups)
 
-        logging.info(f"Iniciando provisionamento. Meta: {target_capacity} instâncias.")
+        logging.info(f"Iniciando provisionamento. Meta: {target_capacity} {self._unit_label()}.")
 
-        while capacity_fulfilled < target_capacity and groups_to_try:
+        while capacity_fulfilled < target_capacity:
+            current_group = next(groups_to_try, None)
+            if current_group is None:
+                break
             capacity_needed_now = target_capacity - capacity_fulfilled
-            current_group = groups_to_try.pop(0)
 
             provider_name = current_group[0].provider
             provider = self.providers.get(provider_name)
@@ -28,15 +100,18 @@ class FleetService:
             fleet_id, new_instances, errors = provider.create_fleet(
                 current_group,
                 allocation_strategy,
-                capacity_needed_now
+                capacity_needed_now,
+                capacity_unit=self.capacity_unit
             )
+            self._observe(current_group, capacity_needed_now, fleet_id, new_instances, errors)
 
             if fleet_id and new_instances:
                 num_created = len(new_instances)
                 
                 provisioned_fleets_this_run[fleet_id] = new_instances
+                self._record(fleet_id, new_instances)
                 
-                capacity_fulfilled += num_created
+                capacity_fulfilled += sum(vm.weight for vm in new_instances)
 
                 logging.info(f"Sucesso! Frota '{fleet_id}' criada na {provider_name.upper()} com {num_created} instâncias.")
                 logging.info(f"Capacidade total atingida: {capacity_fulfilled}/{target_capacity}")
@@ -54,11 +129,16 @@ class FleetService:
     
 
     def provision_fleet_single_cloud(self, instances, target_capacity, allocation_strategy):
+        with tracer.span('fleet.provision', mode='single_cloud', target_capacity=target_capacity, capacity_unit=self.capacity_unit) as span:
+            provisioned_fleets_this_run = self._provision_single_cloud(instances, target_capacity, allocation_strategy)
+            self._trace_result(span, provisioned_fleets_this_run, target_capacity)
+            return provisioned_fleets_this_run
 
+    def _provision_single_cloud(self, instances, target_capacity, allocation_strategy):
         provisioned_fleets_this_run = {}
         capacity_fulfilled = 0
 
-        logging.info(f"Iniciando provisionamento. Meta: {target_capacity} instâncias.")
+        logging.info(f"Iniciando provisionamento. Meta: {target_capacity} {self._unit_label()}.")
 
         provider_name = instances[0].provider
         provider = self.providers.get(provider_name)
@@ -66,15 +146,18 @@ class FleetService:
         fleet_id, new_instances, errors = provider.create_fleet(
             instances,
             allocation_strategy,
-            target_capacity
+            target_capacity,
+            capacity_unit=self.capacity_unit
         )
+        self._observe(instances, target_capacity, fleet_id, new_instances, errors)
 
         if fleet_id and new_instances:
             num_created = len(new_instances)
             
             provisioned_fleets_this_run[fleet_id] = new_instances
+            self._record(fleet_id, new_instances)
             
-            capacity_fulfilled += num_created
+            capacity_fulfilled += sum(vm.weight for vm in new_instances)
 
             logging.info(f"Sucesso! Frota '{fleet_id}' criada na {provider_name.upper()} com {num_created} instâncias.")
             logging.info(f"Capacidade total atingida: {capacity_fulfilled}/{target_capacity}")
@@ -94,7 +177,356 @@ class FleetService:
 
     
 
-    def delete_fleet(self):
-        for provider_name in self.providers:
-            provider = self.providers.get(provider_name)
-            provider.delete_fleet()
+    def _provision_parallel(self, sorted_groups, target_capacity, allocation_strategy):
+        # Em cada rodada, a capacidade que falta é dividida entre os próximos
+        # parallel_groups grupos (de qualquer provedor), criados ao mesmo tempo; a
+        # falta de um grupo é coberta na rodada seguinte em vez de esperar um
+        # provisionamento inteiro por grupo. O que passar da meta é encerrado no fim.
+        provisioned_fleets_this_run = {}
+        capacity_fulfilled = 0
+        groups_to_try = iter(sorted_groups)
+
+        logging.info(f"Iniciando provisionamento paralelo ({self.parallel_groups} grupos por rodada). Meta: {target_capacity} {self._unit_label()}.")
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.parallel_groups, thread_name_prefix="FleetGroup") as executor:
+            while capacity_fulfilled < target_capacity:
+                capacity_needed_now = math.ceil(target_capacity - capacity_fulfilled)
+                batch = list(itertools.islice(groups_to_try, min(self.parallel_groups, capacity_needed_now)))
+                if not batch:
+                    break
+
+                batch = [group for group in batch if self._provider_for(group)]
+                shares = self._split_capacity(capacity_needed_now, len(batch))
+                for _, _, fleet_id, new_instances in self._launch(executor, list(zip(batch, shares)), allocation_strategy):
+                    provisioned_fleets_this_run[fleet_id] = new_instances
+                    self._record(fleet_id, new_instances)
+                    capacity_fulfilled += sum(vm.weight for vm in new_instances)
+                    logging.info(f"Capacidade total atingida: {capacity_fulfilled}/{target_capacity}")
+
+        return self._finish_provisioning(provisioned_fleets_this_run, capacity_fulfilled, target_capacity)
+
+    def _provision_planned(self, sorted_groups, target_capacity, allocation_strategy):
+        # O planner decide quanto pedir a cada grupo; as alocações do plano são
+        # executadas juntas (até parallel_groups ao mesmo tempo). Grupos que
+        # entregam menos que o pedido são dados como esgotados e a falta é
+        # replanejada sobre os demais.
+        groups = [group for group in sorted_groups if group and self._provider_for(group)]
+        capacities = self.planner.capacities(groups, target_capacity)
+        provisioned_fleets_this_run = {}
+        capacity_fulfilled = 0
+
+        logging.info(f"Iniciando provisionamento planejado com {len(groups)} grupos. Meta: {target_capacity} {self._unit_label()}.")
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.parallel_groups, thread_name_prefix="FleetGroup") as executor:
+            while capacity_fulfilled < target_capacity:
+                plan = self.planner.plan(groups, target_capacity - capacity_fulfilled, capacities)
+                if not plan.allocations:
+                    break
+                logging.info(f"Plano: {len(plan.allocations)} grupos, {plan.planned_capacity} {self._unit_label()}, custo esperado {plan.expected_cost:.4f}/h.")
+
+                batch = [(group, units) for _, group, units in plan.allocations]
+                indexes = {id(group): index for index, group, _ in plan.allocations}
+                for index, _, _ in plan.allocations:
+                    capacities[index] = 0
+                delivered = {}
+                for group, units, fleet_id, new_instances in self._launch(executor, batch, allocation_strategy):
+                    provisioned_fleets_this_run[fleet_id] = new_instances
+                    self._record(fleet_id, new_instances)
+                    delivered[id(group)] = sum(vm.weight for vm in new_instances)
+                    capacity_fulfilled += delivered[id(group)]
+                    logging.info(f"Capacidade total atingida: {capacity_fulfilled}/{target_capacity}")
+
+                for group, units in batch:
+                    # Quem entregou tudo o que foi pedido pode ter mais capacidade.
+                    if delivered.get(id(group), 0) >= units:
+                        capacities[indexes[id(group)]] = self.planner.capacity_of(group, target_capacity)
+
+        return self._finish_provisioning(provisioned_fleets_this_run, capacity_fulfilled, target_capacity)
+
+    def _provision_hedged(self, sorted_groups, target_capacity, allocation_strategy):
+        provisioned_fleets_this_run = {}
+        capacity_fulfilled = 0
+        groups_to_try = (group for group in sorted_groups if self._provider_for(group))
+        in_flight = {}
+        started_at = time.monotonic()
+        report = {
+            "target_capacity": target_capacity,
+            "time_to_capacity_seconds": None,
+            "hedges": 0,
+            "surplus_terminated": 0,
+            "surplus_cost": 0.0,
+            "hourly_cost": 0.0,
+            "hourly_premium": 0.0,
+        }
+        baseline_unit_price = None
+
+        logging.info(f"Iniciando provisionamento com hedge ({self.hedge_fraction:.0%} em {self.hedge_after}s). Meta: {target_capacity} {self._unit_label()}.")
+
+        def launch(units, hedge=False):
+            group = next(groups_to_try, None)
+            if group is None:
+                return None
+            state = _HedgedLaunch(group, units, hedge)
+            future = executor.submit(
+                tracer.bind(self.providers[group[0].provider].create_fleet),
+                group,
+                allocation_strategy,
+                units,
+                capacity_unit=self.capacity_unit,
+                on_ready=state.add_ready
+            )
+            in_flight[future] = state
+            return state
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="FleetHedge")
+        try:
+            first = launch(target_capacity)
+            if first is not None:
+                baseline_unit_price = min(vm.unit_price for vm in first.group)
+
+            while in_flight:
+                pending_hedges = [pending for pending in in_flight.values() if not pending.hedged]
+                timeout = None
+                if pending_hedges and capacity_fulfilled < target_capacity:
+                    timeout = max(0, min(pending.started_at + self.hedge_after for pending in pending_hedges) - time.monotonic())
+                done, _ = concurrent.futures.wait(in_flight, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+
+                for future in done:
+                    launch_state = in_flight.pop(future)
+                    provider_name = launch_state.group[0].provider
+                    try:
+                        fleet_id, new_instances, errors = future.result()
+                    except Exception as e:
+                        logging.error(f"Erro ao provisionar grupo na {provider_name.upper()}: {e}")
+                        continue
+                    self._observe(launch_state.group, launch_state.units, fleet_id, new_instances, errors)
+                    if not (fleet_id and new_instances):
+                        logging.warning(f"Falha ao provisionar instâncias com o provedor {provider_name.upper()}. Tentando próxima opção.")
+                        continue
+
+                    logging.info(f"Sucesso! Frota '{fleet_id}' criada na {provider_name.upper()} com {len(new_instances)} instâncias{' (hedge)' if launch_state.hedge else ''}.")
+                    fleet = {fleet_id: list(new_instances)}
+                    self._record(fleet_id, new_instances)
+                    arrived = sum(vm.weight for vm in new_instances)
+                    excess = capacity_fulfilled + arrived - target_capacity
+                    if excess > 0:
+                        # Chegou depois da meta (ou a ultrapassou): o excedente sai desta frota.
+                        removed = self._terminate_surplus(fleet, excess)
+                        kept = {id(vm) for vm in fleet.get(fleet_id, [])}
+                        lifetime_hours = (time.monotonic() - launch_state.started_at) / 3600
+                        report["surplus_terminated"] += removed
+                        report["surplus_cost"] += sum(vm.price for vm in new_instances if id(vm) not in kept) * lifetime_hours
+                        arrived -= removed
+                    provisioned_fleets_this_run.update(fleet)
+                    capacity_fulfilled += arrived
+                    logging.info(f"Capacidade total atingida: {capacity_fulfilled}/{target_capacity}")
+                    if capacity_fulfilled >= target_capacity and report["time_to_capacity_seconds"] is None:
+                        report["time_to_capacity_seconds"] = round(time.monotonic() - started_at, 3)
+
+                if capacity_fulfilled >= target_capacity:
+                    for future in list(in_flight):
+                        if future.cancel():
+                            in_flight.pop(future)
+                    continue
+
+                now = time.monotonic()
+                for launch_state in list(in_flight.values()):
+                    if launch_state.hedged or now - launch_state.started_at < self.hedge_after:
+                        continue
+                    launch_state.hedged = True
+                    if launch_state.ready >= self.hedge_fraction * launch_state.units:
+                        continue
+                    missing = launch_state.units - launch_state.ready
+                    hedge = launch(missing, hedge=True)
+                    if hedge is not None:
+                        report["hedges"] += 1
+                        logging.info(f"Hedge: {launch_state.ready}/{launch_state.units} prontas após {self.hedge_after}s; pedindo {missing} à {hedge.group[0].provider.upper()}.")
+
+                if not in_flight:
+                    launch(target_capacity - capacity_fulfilled)
+        finally:
+            executor.shutdown(wait=True)
+
+        vms = [vm for fleet_vms in provisioned_fleets_this_run.values() for vm in fleet_vms]
+        report["capacity_fulfilled"] = capacity_fulfilled
+        report["hourly_cost"] = round(sum(vm.price for vm in vms), 6)
+        if baseline_unit_price is not None:
+            report["hourly_premium"] = round(report["hourly_cost"] - baseline_unit_price * capacity_fulfilled, 6)
+        report["surplus_cost"] = round(report["surplus_cost"], 6)
+        self.last_report = report
+        logging.info(f"Relatório de hedge: {report}")
+
+        return self._finish_provisioning(provisioned_fleets_this_run, capacity_fulfilled, target_capacity)
+
+    def _launch(self, executor, batch, allocation_strategy):
+        # Cria uma frota por (grupo, unidades) em paralelo e gera
+        # (grupo, unidades, fleet_id, instâncias) para cada uma que subiu VMs.
+        future_to_batch = {
+            executor.submit(
+                tracer.bind(self.providers[group[0].provider].create_fleet),
+                group,
+                allocation_strategy,
+                units,
+                capacity_unit=self.capacity_unit
+            ): (group, units)
+            for group, units in batch
+        }
+
+        for future in concurrent.futures.as_completed(future_to_batch):
+            group, units = future_to_batch[future]
+            provider_name = group[0].provider
+            try:
+                fleet_id, new_instances, errors = future.result()
+            except Exception as e:
+                logging.error(f"Erro ao provisionar grupo na {provider_name.upper()}: {e}")
+                continue
+            self._observe(group, units, fleet_id, new_instances, errors)
+
+            if fleet_id and new_instances:
+                logging.info(f"Sucesso! Frota '{fleet_id}' criada na {provider_name.upper()} com {len(new_instances)} instâncias.")
+                yield group, units, fleet_id, new_instances
+            else:
+                logging.warning(f"Falha ao provisionar instâncias com o provedor {provider_name.upper()}. Tentando próxima opção.")
+
+    def _finish_provisioning(self, provisioned_fleets_this_run, capacity_fulfilled, target_capacity):
+        if capacity_fulfilled > target_capacity:
+            capacity_fulfilled -= self._terminate_surplus(provisioned_fleets_this_run, capacity_fulfilled - target_capacity)
+            logging.info(f"Capacidade após encerrar o excedente: {capacity_fulfilled}/{target_capacity}")
+
+        if provisioned_fleets_this_run:
+            self.fleets.update(provisioned_fleets_this_run)
+            logging.info("Processo de provisionamento finalizado.")
+        else:
+            logging.error("Não foi possível provisionar nenhuma instância para atender à capacidade desejada.")
+
+        return provisioned_fleets_this_run
+
+    @staticmethod
+    def _trace_result(span, fleets, target_capacity):
+        vms = [vm for fleet_vms in fleets.values() for vm in fleet_vms]
+        fulfilled = sum(vm.weight for vm in vms)
+        span.set(fleets=len(fleets), instances=len(vms), capacity_fulfilled=fulfilled, fulfilled=fulfilled >= target_capacity)
+
+    def _provider_for(self, group):
+        provider = self.providers.get(group[0].provider)
+        if not provider:
+            logging.warning(f"Provedor '{group[0].provider}' não encontrado. Pulando.")
+        return provider
+
+    @staticmethod
+    def _split_capacity(capacity, parts):
+        # Divisão inteira; o resto vai para os primeiros grupos, os mais baratos.
+        base, remainder = divmod(capacity, parts) if parts else (0, 0)
+        return [base + (1 if i < remainder else 0) for i in range(parts)]
+
+    def _terminate_surplus(self, fleets, surplus):
+        # Encerra as VMs mais caras por unidade enquanto cabem inteiras no excedente;
+        # retorna a capacidade efetivamente removida.
+        vms = sorted(
+            ((fleet_id, vm) for fleet_id, fleet_vms in fleets.items() for vm in fleet_vms),
+            key=lambda item: item[1].price / item[1].weight,
+            reverse=True
+        )
+        to_terminate = defaultdict(list)
+        for fleet_id, vm in vms:
+            if vm.weight <= surplus:
+                to_terminate[vm.provider].append((fleet_id, vm))
+                surplus -= vm.weight
+        if not to_terminate:
+            return 0
+
+        removed = 0
+        for provider_name, items in to_terminate.items():
+            try:
+                terminated = set(self.providers[provider_name].terminate_instances([vm for _, vm in items]))
+            except Exception as e:
+                logging.error(f"Falha ao encerrar o excedente na {provider_name.upper()}: {e}")
+                continue
+            for fleet_id, vm in items:
+                if vm.instance_id in terminated:
+                    fleets[fleet_id].remove(vm)
+                    removed += vm.weight
+            if self.state_store is not None:
+                self.state_store.mark_instances(terminated, TERMINATED)
+            logging.info(f"{len(terminated)} instâncias excedentes encerradas na {provider_name.upper()}.")
+
+        for fleet_id in [fleet_id for fleet_id, fleet_vms in fleets.items() if not fleet_vms]:
+            del fleets[fleet_id]
+        return removed
+
+    def _unit_label(self):
+        return {'vcpu': 'vCPUs', 'memory': 'GiB de RAM'}.get(self.capacity_unit, 'instâncias')
+
+    def _record(self, fleet_id, vms):
+        if self.state_store is None:
+            return
+        self._recorded_fleet_ids.add(fleet_id)
+        try:
+            self.state_store.record_fleet(fleet_id, vms)
+        except Exception as e:
+            logging.error(f"Falha ao gravar a frota '{fleet_id}' no estado local: {e}")
+
+    def _observe(self, group, units, fleet_id, vms, errors):
+        # Sem fleet_id a chamada falhou antes de chegar à nuvem (credencial,
+        # rede): não diz nada sobre a capacidade do grupo.
+        if self.fulfillment is None or not fleet_id:
+            return
+        try:
+            self.fulfillment.observe(group, units, vms, errors)
+        except Exception as e:
+            logging.error(f"Falha ao registrar o atendimento da frota '{fleet_id}': {e}")
+
+    def delete_fleet(self, include_previous_runs=False):
+        # Desmonta todos os provedores ao mesmo tempo (cada um paraleliza suas
+        # regiões) e retorna {provedor: {região: relatório}}. Do FleetStateStore
+        # entram só as frotas gravadas por esta instância, a menos que
+        # include_previous_runs (main.py --teardown) peça todas as ainda ativas.
+        with tracer.span('fleet.teardown', providers=sorted(self.providers), include_previous_runs=include_previous_runs) as span:
+            report = self._delete_fleet(include_previous_runs)
+            regions = [region_report for regions in report.values() for region_report in regions.values()]
+            span.set(
+                regions=len(regions),
+                terminated=sum(region_report.get("terminated", 0) for region_report in regions),
+                errors=sum(1 for region_report in regions if region_report.get("error"))
+            )
+            return report
+
+    def _delete_fleet(self, include_previous_runs):
+        fleets_by_provider = {}
+        if self.state_store is not None:
+            for provider_name in self.providers:
+                fleets_by_provider[provider_name] = {
+                    fleet_id: self.state_store.instances(fleet_id=fleet_id, state=RUNNING)
+                    for fleet_id, _, _ in self.state_store.fleets(provider=provider_name)
+                    if include_previous_runs or fleet_id in self._recorded_fleet_ids
+                }
+
+        started_at = time.monotonic()
+        report = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(self.providers)), thread_name_prefix="Teardown") as executor:
+            future_to_provider = {
+                executor.submit(tracer.bind(provider.delete_fleet), *((fleets_by_provider[provider_name],) if provider_name in fleets_by_provider else ())): provider_name
+                for provider_name, provider in self.providers.items()
+            }
+            for future in concurrent.futures.as_completed(future_to_provider):
+                provider_name = future_to_provider[future]
+                try:
+                    report[provider_name] = future.result() or {}
+                except Exception as e:
+                    logging.error(f"Falha ao desmontar a {provider_name.upper()}: {e}")
+                    report[provider_name] = {None: {"found": 0, "terminated": 0, "seconds": 0.0, "error": str(e)}}
+
+        for provider_name, fleets in fleets_by_provider.items():
+            # Só marca como encerrado o que estava em regiões desmontadas sem erro.
+            regions = report.get(provider_name, {})
+            if regions.get(None, {}).get("error"):
+                continue
+            done = [fleet_id for fleet_id, vms in fleets.items() if all(not regions.get(vm.region, {}).get("error") for vm in vms)]
+            self.state_store.mark_instances([vm.instance_id for fleet_id in done for vm in fleets[fleet_id]], TERMINATED)
+            self.state_store.mark_fleets(done, 'deleted')
+
+        for provider_name, regions in report.items():
+            for region, region_report in sorted(regions.items(), key=lambda item: str(item[0])):
+                logging.info(f"Desmontagem {provider_name.upper()}/{region}: {region_report}")
+        logging.info(f"Desmontagem concluída em {time.monotonic() - started_at:.2f}s.")
+        return report
@@ -0,0 +1,116 @@
+import logging
+from collections import defaultdict
+
+from ..core.catalog import CompiledCatalog
+
+# Códigos de erro do create_fleet que indicam falta de capacidade no pool
+# (EC2 Fleet e Compute Fleet), e não erro de configuração ou permissão.
+CAPACITY_ERROR_CODES = (
+    'InsufficientInstanceCapacity', 'InsufficientCapacity', 'UnfulfillableCapacity',
+    'MaxSpotInstanceCountExceeded', 'SpotMaxPriceTooLow',
+    'AllocationFailed', 'ZonalAllocationFailed', 'SkuNotAvailable',
+)
+
+
+class FulfillmentRanker:
+    # Ordena os grupos pelo custo esperado por unidade entregue: o custo por
+    # unidade do grupo dividido pela taxa de atendimento que o histórico
+    # (FulfillmentStats) estima para as suas chaves. Um grupo barato que sempre
+    # volta com InsufficientInstanceCapacity deixa de ser tentado primeiro. Sem
+    # histórico a taxa é prior_rate para todos e a ordem de preço é mantida.
+    def __init__(self, stats, prior_rate=1.0, prior_weight=1.0, min_rate=0.05, catalog=None):
+        self.stats = stats
+        # Traduz a SubnetId dos erros do EC2 Fleet de volta para a AZ.
+        self.catalog = catalog
+        self.prior_rate = prior_rate
+        # Peso do prior em observações: com 1.0, uma única falha leva a chave a 50%.
+        self.prior_weight = prior_weight
+        self.min_rate = min_rate
+
+    @staticmethod
+    def keys_for(vm):
+        return [(vm.provider, vm.region, az, vm.instance_type) for az, _ in (vm.az_prices or ((vm.region_az, vm.price),))]
+
+    @staticmethod
+    def _type_aliases(instance_type):
+        # O Azure devolve 'Standard_D2s_v5' para o tipo 'D2s v5' do catálogo.
+        return (instance_type, 'Standard_' + instance_type.replace(' ', '_'))
+
+    def _az_for_subnet(self, region, subnet_id):
+        if subnet_id is None:
+            return None
+        if self.catalog is None:
+            self.catalog = CompiledCatalog.load()
+        return self.catalog.az_for_subnet(region, subnet_id)
+
+    def observe(self, group, requested, vms, errors):
+        # Converte o resultado de um create_fleet(group, requested) em uma
+        # observação por chave: quem entregou VMs conta como atendida (1), mesmo
+        # que a frota tenha ficado abaixo de um pedido grande; quem falhou por
+        # capacidade, ou não entregou nada em uma frota que ficou abaixo do
+        # pedido, conta 0. Com o pedido atendido, as chaves que a frota nem
+        # precisou usar ficam sem observação. Retorna a fração atendida da frota.
+        keys = {key: vm for vm in group for key in self.keys_for(vm)}
+        specs_by_type = defaultdict(list)
+        for vm in group:
+            for alias in self._type_aliases(vm.instance_type):
+                specs_by_type[alias].append(vm)
+
+        delivered = defaultdict(float)
+        for fleet_vm in vms or []:
+            specs = specs_by_type.get(fleet_vm.instance_type)
+            if not specs:
+                continue
+            spec = next((vm for vm in specs if vm.region == fleet_vm.region), specs[0])
+            key = (spec.provider, spec.region, fleet_vm.region_az, spec.instance_type)
+            delivered[key if key in keys else self.keys_for(spec)[0]] += fleet_vm.weight
+
+        failed = set()
+        for error in errors or []:
+            if not isinstance(error, dict) or error.get('ErrorCode') not in CAPACITY_ERROR_CODES:
+                continue
+            # O EC2 Fleet ecoa só InstanceType e SubnetId do override que falhou.
+            overrides = error.get('LaunchTemplateAndOverrides', {}).get('Overrides', {})
+            for spec in specs_by_type.get(overrides.get('InstanceType'), []):
+                region_az = overrides.get('AvailabilityZone') or self._az_for_subnet(spec.region, overrides.get('SubnetId'))
+                if region_az is None:
+                    # Sem AZ conhecida a falha não é atribuída: culpar todas as AZs
+                    # penalizaria pools que a frota nem tentou.
+                    continue
+                failed.update(key for key in self.keys_for(spec) if key[2] == region_az)
+
+        fraction = min(1.0, sum(delivered.values()) / requested) if requested > 0 else 0.0
+        observations = []
+        for key in keys:
+            if key in delivered:
+                observations.append((key, 1.0, requested, delivered[key], key in failed))
+            elif key in failed or fraction < 1.0:
+                observations.append((key, 0.0, requested, 0.0, key in failed))
+        self.stats.record(observations)
+        return fraction
+
+    def fill_rate(self, group, rows=None):
+        # Melhor taxa suavizada entre as chaves do grupo, (atendido + prior) /
+        # (tentativas + peso do prior): a frota recorre aos outros pools do grupo,
+        # então basta um que costume ter capacidade.
+        rows = self.stats.rows() if rows is None else rows
+        keys = {key for vm in group for key in self.keys_for(vm)}
+        rates = []
+        for key in keys:
+            row = rows.get(key)
+            attempts, fulfilled = (row['attempts'], row['fulfilled']) if row else (0.0, 0.0)
+            rates.append((fulfilled + self.prior_weight * self.prior_rate) / (attempts + self.prior_weight))
+        return max(rates) if rates else self.prior_rate
+
+    def expected_unit_cost(self, group, rows=None):
+        return min(vm.unit_price for vm in group) / max(self.fill_rate(group, rows), self.min_rate)
+
+    def rank(self, groups):
+        rows = self.stats.rows()
+        if not rows:
+            return list(groups)
+        ranked = sorted(groups, key=lambda group: self.expected_unit_cost(group, rows))
+        moved = sum(1 for before, after in zip(groups, ranked) if before is not after)
+        if moved:
+            logging.info(f"FulfillmentRanker: {moved} grupos reordenados pelo histórico de atendimento.")
+        return ranked
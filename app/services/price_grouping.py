@@ -0,0 +1,147 @@
+# O NumPy só é importado quando um catálogo passa de VECTORIZE_MIN_SIZE, para não
+# pesar na inicialização das execuções comuns.
+np = None
+
+
+def load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy # type: ignore
+        except ImportError:
+            return None
+        np = numpy
+    return np
+
+MAX_REL_DIFF = 0.3
+
+# Montar as colunas a partir dos VMSpec custa quase tanto quanto o laço original,
+# por isso o PriceColumnsBuilder as monta enquanto as cotações chegam; abaixo disso
+# (ver benchmark_grouping.py) nem assim o caminho vetorizado compensa.
+VECTORIZE_MIN_SIZE = 100_000
+
+
+class PriceColumns:
+    # Visão colunar de uma lista de VMSpec já ordenada: preços por unidade em float64 e
+    # provedor/região codificados como inteiros, para agrupar sem tocar nos objetos.
+    def __init__(self, prices, provider_codes, region_codes):
+        self.prices = prices
+        self.provider_codes = provider_codes
+        self.region_codes = region_codes
+
+    @classmethod
+    def from_vms(cls, vms):
+        return cls(
+            np.array([vm.unit_price for vm in vms], dtype=np.float64),
+            cls._codes([vm.provider for vm in vms]),
+            cls._codes([vm.region for vm in vms]),
+        )
+
+    @staticmethod
+    def _codes(values):
+        lookup = {value: code for code, value in enumerate(dict.fromkeys(values))}
+        return np.fromiter(map(lookup.__getitem__, values), dtype=np.int32, count=len(values))
+
+    def sorted_by_price(self):
+        # Ordem estável por preço por unidade, a mesma do CostRanker.rank.
+        order = np.argsort(self.prices, kind='stable')
+        return order, PriceColumns(self.prices[order], self.provider_codes[order], self.region_codes[order])
+
+    def group_bounds(self, max_rel_diff=MAX_REL_DIFF):
+        # Retorna os índices de início de cada grupo seguidos de len(prices), com a
+        # mesma regra do laço original: o grupo fecha na troca de provedor/região ou
+        # quando (preço - âncora) / âncora passa de max_rel_diff, sendo a âncora o
+        # primeiro preço do grupo. Retorna None quando algum trecho de mesmo
+        # provedor/região está fora de ordem ou há preços não positivos/inválidos;
+        # nesses casos o predicado deixa de ser monótono e vale o laço original.
+        prices = self.prices
+        count = len(prices)
+        if count == 0:
+            return [0]
+        if not np.all(np.isfinite(prices)) or np.any(prices <= 0):
+            return None
+
+        same_segment = (self.provider_codes[1:] == self.provider_codes[:-1]) & (self.region_codes[1:] == self.region_codes[:-1])
+        if np.any(same_segment & (prices[1:] < prices[:-1])):
+            return None
+
+        segment_ids = np.concatenate(([0], np.cumsum(~same_segment)))
+        segment_ends = np.append(np.flatnonzero(~same_segment) + 1, count)[segment_ids]
+
+        # Chave inteira crescente em todo o vetor: (trecho, posto do preço). Assim um
+        # único searchsorted resolve o fim do grupo de todas as âncoras de uma vez.
+        unique_prices, ranks = np.unique(prices, return_inverse=True)
+        stride = len(unique_prices) + 1
+        keys = segment_ids.astype(np.int64) * stride + ranks
+
+        # O limiar âncora * (1 + max_rel_diff) pode diferir do predicado exato por
+        # arredondamento; os ajustes abaixo corrigem isso saltando blocos de preços
+        # iguais de uma vez.
+        thresholds = np.searchsorted(unique_prices, prices * (1 + max_rel_diff), side='right') - 1
+        next_anchor = np.searchsorted(keys, segment_ids.astype(np.int64) * stride + thresholds, side='right')
+
+        while True:
+            pending = np.flatnonzero(next_anchor < segment_ends)
+            candidates = next_anchor[pending]
+            inside = (prices[candidates] - prices[pending]) / prices[pending] <= max_rel_diff
+            if not inside.any():
+                break
+            next_anchor[pending[inside]] = np.searchsorted(keys, keys[candidates[inside]], side='right')
+
+        while True:
+            pending = np.flatnonzero(next_anchor - 1 > np.arange(count))
+            candidates = next_anchor[pending] - 1
+            outside = (prices[candidates] - prices[pending]) / prices[pending] > max_rel_diff
+            if not outside.any():
+                break
+            next_anchor[pending[outside]] = np.searchsorted(keys, keys[candidates[outside]], side='left')
+
+        # O fim do último grupo de um trecho é o início do próximo, então uma única
+        # cadeia a partir de 0 percorre todos os grupos.
+        next_anchor = next_anchor.tolist()
+        bounds = []
+        anchor = 0
+        while anchor < count:
+            bounds.append(anchor)
+            anchor = next_anchor[anchor]
+        bounds.append(count)
+        return bounds
+
+
+class PriceColumnsBuilder:
+    # Acumula as VMs cotadas região a região. A partir de VECTORIZE_MIN_SIZE VMs
+    # (com NumPy disponível) também mantém as colunas de PriceColumns, montadas a
+    # cada região que chega, enquanto as outras ainda estão sendo cotadas; assim a
+    # consolidação ordena e agrupa sem percorrer os objetos de novo.
+    def __init__(self):
+        self.vms = []
+        self._chunks = None
+        self._provider_codes = {}
+        self._region_codes = {}
+
+    def extend(self, vms):
+        start = len(self.vms)
+        self.vms.extend(vms)
+        if self._chunks is None:
+            if len(self.vms) < VECTORIZE_MIN_SIZE or load_numpy() is None:
+                return
+            self._chunks = []
+            start = 0
+        self._chunks.append(self._columns(self.vms[start:]))
+
+    def _columns(self, vms):
+        count = len(vms)
+        return (
+            np.fromiter((vm.unit_price for vm in vms), dtype=np.float64, count=count),
+            np.fromiter((self._provider_codes.setdefault(vm.provider, len(self._provider_codes)) for vm in vms), dtype=np.int32, count=count),
+            np.fromiter((self._region_codes.setdefault(vm.region, len(self._region_codes)) for vm in vms), dtype=np.int32, count=count),
+        )
+
+    def ranked(self):
+        # (VMs ordenadas por preço por unidade, PriceColumns na mesma ordem), ou
+        # None se o catálogo ficou abaixo de VECTORIZE_MIN_SIZE.
+        if self._chunks is None:
+            return None
+        columns = PriceColumns(*(np.concatenate(column) for column in zip(*self._chunks)))
+        order, columns = columns.sorted_by_price()
+        return [self.vms[i] for i in order.tolist()], columns
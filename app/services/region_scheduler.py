@@ -0,0 +1,103 @@
+import concurrent.futures
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from ..core.tracing import tracer
+
+
+class CatalogProgress:
+    # Andamento da construção do catálogo, atualizado pelas tarefas de cada
+    # (provedor, região); snapshot() pode ser consultado de qualquer thread.
+    def __init__(self, tasks):
+        self.regions_total = len(tasks)
+        self.quotes_total = sum(len(candidates) for candidates in tasks.values())
+        self.regions_done = 0
+        self.regions_failed = 0
+        self.priced = 0
+        self.started_at = time.time()
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def region_started(self, key):
+        with self._lock:
+            self._running.add(key)
+
+    def vm_priced(self):
+        with self._lock:
+            self.priced += 1
+
+    def region_finished(self, key, failed=False):
+        with self._lock:
+            self._running.discard(key)
+            self.regions_done += 1
+            if failed:
+                self.regions_failed += 1
+            done, total, priced = self.regions_done, self.regions_total, self.priced
+
+        provider_name, region_name = key
+        logging.info(
+            f"CATALOG SERVICE: {provider_name.upper()}/{region_name} {'falhou' if failed else 'concluída'} "
+            f"({done}/{total} regiões, {priced} VMs com preço, {time.time() - self.started_at:.2f}s)."
+        )
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "regions_total": self.regions_total,
+                "regions_done": self.regions_done,
+                "regions_failed": self.regions_failed,
+                "regions_running": sorted(self._running),
+                "quotes_total": self.quotes_total,
+                "priced": self.priced,
+                "elapsed_seconds": round(time.time() - self.started_at, 3),
+            }
+
+
+class RegionScheduler:
+    # Distribui o catálogo em tarefas por (provedor, região) sob um único limite
+    # de concorrência, em vez de uma thread por provedor cotando suas regiões
+    # em sequência. O executor é do scheduler e vale para todas as chamadas de
+    # submit; close() cancela o que ainda está na fila e espera as tarefas em curso.
+    def __init__(self, max_concurrency=32):
+        self.max_concurrency = max_concurrency
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=max(1, self.max_concurrency),
+                    thread_name_prefix="CatalogRegion"
+                )
+            return self._executor
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def partition(provider_name, candidates):
+        tasks = defaultdict(list)
+        for item in candidates:
+            tasks[(provider_name, item['region'])].append(item)
+        return tasks
+
+    def submit(self, tasks, fn, *args):
+        # Retorna {future: (provedor, região)}; fn recebe (provedor, região, candidatos, *args).
+        if not tasks:
+            return {}
+        executor = self._get_executor()
+        return {
+            executor.submit(tracer.bind(fn), provider_name, region_name, candidates, *args): (provider_name, region_name)
+            for (provider_name, region_name), candidates in tasks.items()
+        }
+
+    @staticmethod
+    def cancel(future_to_key):
+        # Cancela as tarefas que ainda não começaram; retorna as suas chaves.
+        return [key for future, key in future_to_key.items() if future.cancel()]
@@ -0,0 +1,45 @@
+import heapq
+import itertools
+from collections import defaultdict
+
+
+class RegionTopK:
+    # Guarda apenas os `limit` VMSpec mais baratos por unidade de capacidade de
+    # cada (provedor, região), em um heap de máximo limitado; memória e ordenação
+    # escalam com K, não com o tamanho do catálogo. limit None (ou <= 0) mantém
+    # todas as VMs.
+    def __init__(self, limit=None, max_price=None):
+        self.limit = limit if limit and limit > 0 else None
+        self.max_price = max_price
+        self.seen = 0
+        self._heaps = defaultdict(list)
+        self._sequence = itertools.count()
+
+    def push(self, vm):
+        self.seen += 1
+        heap = self._heaps[(vm.provider, vm.region)]
+        # Em empate de preço, a VM que chegou por último é a primeira a sair.
+        entry = (-vm.unit_price, -next(self._sequence), vm)
+
+        if self.limit is None or len(heap) < self.limit:
+            heapq.heappush(heap, entry)
+        elif vm.unit_price < -heap[0][0]:
+            heapq.heapreplace(heap, entry)
+
+    def satisfied(self, keys):
+        # Com max_price definido, uma região está resolvida quando já tem K
+        # candidatas abaixo dele: nenhuma cotação restante poderia mudar a escolha
+        # de forma relevante.
+        if self.limit is None or self.max_price is None:
+            return False
+        for key in keys:
+            heap = self._heaps.get(key)
+            if not heap or len(heap) < self.limit or -heap[0][0] > self.max_price:
+                return False
+        return True
+
+    def items(self):
+        return [vm for heap in self._heaps.values() for _, _, vm in heap]
+
+    def __len__(self):
+        return sum(len(heap) for heap in self._heaps.values())
@@ -0,0 +1,80 @@
+import argparse
+import logging
+import random
+import time
+
+from app.core.models import VMSpec
+from app.services.catalog_service import CatalogService
+from app.services.price_grouping import PriceColumns, PriceColumnsBuilder, load_numpy
+
+
+def synthetic_vms(n, seed=42):
+    # Preços com uma casa decimal geram muitos empates e pares exatamente na
+    # fronteira de MAX_REL_DIFF (ex.: 1.0 e 1.3), onde o arredondamento importa.
+    rng = random.Random(seed)
+    regions = [('aws', 'sa-east-1'), ('aws', 'us-east-1'), ('aws', 'us-west-2'), ('azure', 'brazilsouth'), ('azure', 'eastus')]
+    vms = []
+    for i in range(n):
+        provider, region = regions[rng.randrange(len(regions))]
+        price = round(rng.uniform(0.1, 5.0), 1) if i % 2 else round(rng.uniform(0.01, 5.0), 4)
+        vms.append(VMSpec(provider, f'type-{i}', region, f'{region}a', price))
+    return vms
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara o group_by_price em laço com o caminho vetorizado em NumPy.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000], help="Quantidades de VMs sintéticas.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if load_numpy() is None:
+        raise SystemExit("NumPy não está instalado; apenas o laço original está disponível.")
+
+    service = CatalogService({}, None)
+
+    def same_groups(a, b):
+        return [[id(vm) for vm in group] for group in a] == [[id(vm) for vm in group] for group in b]
+
+    for size in args.sizes:
+        vms = synthetic_vms(size)
+
+        # build_catalog_in_parallel: as regiões chegam uma a uma e o catálogo é
+        # ordenado por preço entre todas elas. Antes: CostRanker.rank + laço.
+        # Agora: colunas montadas a cada região (em paralelo às cotações) e só a
+        # ordenação e as fronteiras na consolidação.
+        by_region = {}
+        for vm in vms:
+            by_region.setdefault((vm.provider, vm.region), []).append(vm)
+        arrived = [vm for chunk in by_region.values() for vm in chunk]
+        loop_time, loop_groups = timed(lambda: service._group_by_price_loop(service.ranker.rank(arrived)))
+        builder = PriceColumnsBuilder()
+        columns_time, _ = timed(lambda: [builder.extend(chunk) for chunk in by_region.values()])
+        ranked = builder.ranked()
+        if ranked is None:
+            print(f"{size:>9} VMs | ordem: preço         | abaixo de VECTORIZE_MIN_SIZE, apenas o laço")
+        else:
+            consolidate_time, vector_groups = timed(lambda: service.group_by_price(*ranked))
+            if not same_groups(vector_groups, loop_groups):
+                raise SystemExit(f"Divergência entre laço e NumPy para {size} VMs ordenadas por preço.")
+            print(f"{size:>9} VMs | ordem: preço         | grupos: {len(loop_groups):>7} | "
+                  f"rank + laço: {loop_time * 1000:9.1f} ms | colunas durante as cotações: {columns_time * 1000:8.1f} ms | "
+                  f"consolidação: {consolidate_time * 1000:8.1f} ms | speedup na consolidação: {loop_time / consolidate_time:.1f}x")
+
+        # stream_groups: cada provedor é ordenado por (região, preço) no finalize,
+        # formando poucos grupos longos; aqui o serviço sempre usa o laço, e as
+        # colunas montadas do zero mostram por quê.
+        ordered = sorted(vms, key=lambda vm: (vm.region, vm.unit_price))
+        loop_time, loop_groups = timed(service.group_by_price, ordered)
+        columns_time, columns = timed(PriceColumns.from_vms, ordered)
+        bounds_time, bounds = timed(columns.group_bounds)
+        if not same_groups([ordered[start:end] for start, end in zip(bounds, bounds[1:])], loop_groups):
+            raise SystemExit(f"Divergência entre laço e NumPy para {size} VMs ordenadas por (região, preço).")
+        print(f"{size:>9} VMs | ordem: região, preço | grupos: {len(loop_groups):>7} | "
+              f"laço: {loop_time * 1000:9.1f} ms | colunas + fronteiras: {(columns_time + bounds_time) * 1000:8.1f} ms | "
+              f"speedup se vetorizado: {loop_time / (columns_time + bounds_time):.1f}x")
@@ -0,0 +1,70 @@
+import argparse
+import math
+import random
+import time
+
+from app.core.models import VMSpec
+from app.services.allocation_planner import AllocationPlanner
+
+
+def synthetic_groups(n, seed=42):
+    rng = random.Random(seed)
+    groups, estimates = [], {}
+    for g in range(n):
+        provider = ('aws', 'azure')[rng.randrange(2)]
+        region = f'{provider}-region-{g % 12}'
+        group = [VMSpec(provider, f'type-{g}-{t}', region, f'{region}a', round(rng.uniform(0.01, 5.0), 4), weight=rng.choice((1, 2, 4)))
+                 for t in range(rng.randint(1, 6))]
+        groups.append(group)
+        estimates[id(group)] = rng.choice((0, 5, 10, 20, 50))
+    return groups, estimates
+
+
+def check_optimal(planner, plan, groups, capacities):
+    # Condição de otimalidade do fluxo de custo mínimo nesta estrutura: não existe
+    # grupo mais barato com folga (própria e do provedor) enquanto um mais caro
+    # recebeu unidades, nem sobra capacidade quando há falta.
+    allocated = {index: units for index, _, units in plan.allocations}
+    used = {}
+    for index, units in allocated.items():
+        used[groups[index][0].provider] = used.get(groups[index][0].provider, 0) + units
+    max_cost_used = max((planner.unit_cost(groups[index]) for index in allocated), default=0)
+
+    for index, group in enumerate(groups):
+        provider_name = group[0].provider
+        slack = capacities[index] - allocated.get(index, 0)
+        provider_slack = planner.provider_limits.get(provider_name, math.inf) - used.get(provider_name, 0)
+        if slack > 0 and provider_slack > 0 and (plan.shortfall or planner.unit_cost(group) < max_cost_used):
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede o tempo do AllocationPlanner com milhares de grupos.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 5_000, 20_000], help="Quantidades de grupos sintéticos.")
+    parser.add_argument('--target', type=int, default=2_000, help="Capacidade alvo.")
+    parser.add_argument('--runs', type=int, default=5, help="Execuções por tamanho (é reportada a melhor).")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        groups, estimates = synthetic_groups(size)
+        planner = AllocationPlanner(
+            provider_limits={'aws': args.target * 0.6, 'azure': args.target * 0.6},
+            max_group_share=0.05,
+            estimator=lambda group: estimates[id(group)]
+        )
+
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            capacities = planner.capacities(groups, args.target)
+            plan = planner.plan(groups, args.target, capacities)
+            timings.append(time.perf_counter() - start)
+
+        if not check_optimal(planner, plan, groups, capacities):
+            raise SystemExit(f"Plano não ótimo para {size} grupos.")
+
+        best = min(timings) * 1000
+        print(f"{size:>7} grupos | {sum(len(group) for group in groups):>7} VMs | alocações: {len(plan.allocations):>4} | "
+              f"planejado: {plan.planned_capacity}/{args.target} | custo esperado: {plan.expected_cost:9.3f}/h | "
+              f"tempo: {best:6.1f} ms {f'(folga de {50 - best:.1f} ms até a meta de 50 ms)' if best < 50 else '(ACIMA da meta de 50 ms)'}")
@@ -0,0 +1,124 @@
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from app.clients.pricing_client import PricingClient
+from app.clients.async_pricing_client import AsyncPricingClient
+
+
+class StubPricingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.05
+    # (provider, region) -> tipos conhecidos pela cotação em lote
+    catalog = {}
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        provider = params.get('provider', ['provider'])[0]
+        region = params.get('region', ['region'])[0]
+        time.sleep(self.latency)
+
+        if 'type' in params:
+            payload = {'prices_spot': self._random_prices(region)}
+        else:
+            known_types = self.catalog.get((provider, region), [])
+            offset = int(params.get('page', ['0'])[0])
+            page_size = int(params.get('page_size', ['500'])[0])
+            page = known_types[offset:offset + page_size]
+            payload = {
+                'prices': [{'type': name, 'prices_spot': self._random_prices(region)} for name in page],
+                'next_page': str(offset + page_size) if offset + page_size < len(known_types) else None
+            }
+
+        body = json.dumps(payload).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    @staticmethod
+    def _random_prices(region):
+        return {f'{region}{az}': round(random.uniform(0.5, 2.0), 4) for az in 'abc'}
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubPricingServer(ThreadingHTTPServer):
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def start_stub_server(latency):
+    StubPricingHandler.latency = latency
+    server = StubPricingServer(('127.0.0.1', 0), StubPricingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/prices"
+
+
+def synthetic_items(n):
+    regions = [('aws', 'sa-east-1'), ('aws', 'us-east-1'), ('azure', 'brazilsouth')]
+    return [
+        {
+            'provider': regions[i % len(regions)][0],
+            'instance_type': f'type-{i}',
+            'vcpus': 96,
+            'region': regions[i % len(regions)][1],
+            'market': 'spot'
+        }
+        for i in range(n)
+    ]
+
+
+def register_bulk_catalog(items, coverage):
+    # Deixa parte dos tipos fora da resposta em lote para exercitar o fallback por item.
+    StubPricingHandler.catalog = {}
+    for i, item in enumerate(items):
+        if i % 100 < coverage * 100:
+            StubPricingHandler.catalog.setdefault((item['provider'], item['region']), []).append(item['instance_type'])
+
+
+def run(client, items):
+    start = time.perf_counter()
+    vms = client.get_prices_for(items)
+    return time.perf_counter() - start, len(vms)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara o PricingClient com threads, em lote e o AsyncPricingClient contra um servidor de preços local.")
+    parser.add_argument('--items', type=int, default=300, help="Quantidade de pares (tipo, região) a cotar.")
+    parser.add_argument('--latency', type=float, default=0.05, help="Latência simulada por requisição, em segundos.")
+    parser.add_argument('--concurrency', type=int, default=64, help="Concorrência máxima do cliente assíncrono.")
+    parser.add_argument('--bulk-coverage', type=float, default=0.95, help="Fração dos tipos presentes na cotação em lote do servidor local.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    server, url = start_stub_server(args.latency)
+    items = synthetic_items(args.items)
+    register_bulk_catalog(items, args.bulk_coverage)
+
+    threaded = PricingClient(base_url=url)
+    bulk_client = PricingClient(base_url=url, bulk=True)
+    async_client = AsyncPricingClient(base_url=url, max_concurrency=args.concurrency)
+
+    try:
+        threaded_time, threaded_count = run(threaded, items)
+        bulk_time, bulk_count = run(bulk_client, items)
+        async_time, async_count = run(async_client, items)
+    finally:
+        async_client.close()
+        server.shutdown()
+
+    print(f"Itens: {args.items} | Latência simulada: {args.latency * 1000:.0f} ms")
+    print(f"  PricingClient (5 threads):          {threaded_time:8.3f} s  ({threaded_count} preços)")
+    print(f"  PricingClient (lote por região):    {bulk_time:8.3f} s  ({bulk_count} preços)")
+    print(f"  AsyncPricingClient ({args.concurrency} conexões): {async_time:8.3f} s  ({async_count} preços)")
+    print(f"  Speedup lote: {threaded_time / bulk_time:.1f}x | Speedup assíncrono: {threaded_time / async_time:.1f}x")
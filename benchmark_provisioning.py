@@ -0,0 +1,203 @@
+import argparse
+import itertools
+import logging
+import math
+import random
+import statistics
+import threading
+import time
+
+from app.clients.fulfillment_stats import FulfillmentStats
+from app.core.models import FleetVmSpec, VMSpec
+from app.services.allocation_planner import AllocationPlanner
+from app.services.fleet_service import FleetService
+from app.services.fulfillment_ranking import FulfillmentRanker
+
+
+class SimulatedProvider:
+    # Imita create_fleet do tipo 'instant': cada chamada leva `latency` segundos
+    # simulados (criação + waiter instance_running) e entrega no máximo a
+    # capacidade spot ainda livre de cada tipo no grupo. Com pesos, completa a
+    # meta com a última VM inteira, podendo passar dela como o EC2 Fleet. Com
+    # tail > 0, a duração de cada chamada segue uma log-normal (cauda longa) e as
+    # VMs ficam prontas ao longo dela, avisando on_ready.
+    def __init__(self, name, latency, spot_capacity, time_scale, tail=0.0, rng=None):
+        self.name = name
+        self.latency = latency
+        self.spot_capacity = spot_capacity
+        self.time_scale = time_scale
+        self.tail = tail
+        self.rng = rng or random.Random(0)
+        self.terminated = 0
+        self.calls = 0
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def create_fleet(self, instances, allocation_strategy, target_capacity, tag='MultiCloud', capacity_unit='instance', on_ready=None):
+        fleet_vms = []
+        fulfilled = 0
+        with self._lock:
+            self.calls += 1
+            for inst in instances:
+                key = (inst.region, inst.instance_type)
+                while fulfilled < target_capacity and self.spot_capacity.get(key, 0) > 0:
+                    self.spot_capacity[key] -= 1
+                    fulfilled += inst.weight
+                    fleet_vms.append(FleetVmSpec(self.name, inst.instance_type, f'{self.name}-{next(self._ids)}', f'{inst.region}a', inst.price, None, None, inst.weight, inst.region))
+            fleet_name = f'{self.name.upper()}-FLEET-{next(self._ids)}'
+            duration = self.latency * (self.rng.lognormvariate(0, self.tail) if self.tail else 1)
+            ready_at = sorted((self.rng.uniform(0.3, 1.0) * duration, vm.weight) for vm in fleet_vms)
+
+        elapsed = 0
+        for moment, weight in ready_at:
+            time.sleep((moment - elapsed) * self.time_scale)
+            elapsed = moment
+            if on_ready:
+                on_ready(weight)
+        time.sleep((duration - elapsed) * self.time_scale)
+        return fleet_name, fleet_vms, []
+
+    def terminate_instances(self, vms):
+        self.terminated += len(vms)
+        return [vm.instance_id for vm in vms]
+
+    def delete_fleet(self):
+        pass
+
+
+def synthetic_groups(n_groups, weighted, seed):
+    # Grupos em ordem de preço, alternando provedores; parte deles com pouca
+    # capacidade spot, para que a meta só seja atingida somando vários grupos.
+    rng = random.Random(seed)
+    groups, capacity = [], {'aws': {}, 'azure': {}}
+    for g in range(n_groups):
+        provider = ('aws', 'azure')[g % 2]
+        region = f'{provider}-region-{g % 5}'
+        group = []
+        for t in range(3):
+            instance_type = f'type-{g}-{t}'
+            weight = rng.choice((2, 4, 8)) if weighted else 1
+            group.append(VMSpec(provider, instance_type, region, f'{region}a', round(0.01 * (g + 1) * weight * rng.uniform(0.9, 1.1), 4), weight=weight))
+            capacity[provider][(region, instance_type)] = rng.choice((0, 5, 10, 20, 40))
+        groups.append(sorted(group, key=lambda vm: vm.unit_price))
+    return groups, capacity
+
+
+def run_hedge_trials(hedge_after, args):
+    # Mesmo catálogo e sementes com e sem hedge; tempo até a meta e custo por rodada.
+    results = []
+    for trial in range(args.trials):
+        groups, capacity = synthetic_groups(args.groups, False, args.seed)
+        rng = random.Random(args.seed * 1000 + trial)
+        providers = {
+            name: SimulatedProvider(name, args.latency, capacity[name], args.time_scale, args.tail, rng)
+            for name in ('aws', 'azure')
+        }
+        # Sem hedge = mesmo caminho, com um limiar que nunca é atingido.
+        service = FleetService(providers, 'instance', hedge_after=(hedge_after if hedge_after is not None else 1e6) * args.time_scale, hedge_fraction=args.hedge_fraction)
+        service.provision_fleet_multi_cloud(groups, args.nodes, 'lowest-price')
+        report = service.last_report
+        if report["time_to_capacity_seconds"] is not None:
+            report["time_to_capacity_seconds"] /= args.time_scale
+        report["surplus_cost"] /= args.time_scale
+        results.append(report)
+    return results
+
+
+def run_fulfillment_history(ranked, args):
+    # Execuções seguidas no modo sequencial: uma fração dry_groups dos grupos
+    # (os da falta crônica de capacidade) nunca tem spot livre e os demais pools
+    # são sorteados de novo em 20% das vezes; com ranked, um FulfillmentStats em
+    # memória acumula o histórico entre elas. Retorna (create_fleet, tempo, custo/h) por execução.
+    groups, base_capacity = synthetic_groups(args.groups, False, args.seed)
+    rng = random.Random(args.seed)
+    for group in rng.sample(groups, int(len(groups) * args.dry_groups)):
+        for vm in group:
+            base_capacity[vm.provider][(vm.region, vm.instance_type)] = 0
+    ranker = FulfillmentRanker(FulfillmentStats(':memory:')) if ranked else None
+    results = []
+    for _ in range(args.fulfillment_runs):
+        capacity = {
+            provider: {key: (value if rng.random() < 0.8 else rng.choice((0, 5, 10, 20, 40))) for key, value in pools.items()}
+            for provider, pools in base_capacity.items()
+        }
+        providers = {name: SimulatedProvider(name, args.latency, capacity[name], args.time_scale) for name in ('aws', 'azure')}
+        service = FleetService(providers, 'instance', fulfillment=ranker)
+        start = time.perf_counter()
+        fleets = service.provision_fleet_multi_cloud(groups, args.nodes, 'lowest-price')
+        elapsed = (time.perf_counter() - start) / args.time_scale
+        cost = sum(vm.price for fleet_vms in fleets.values() for vm in fleet_vms)
+        results.append((sum(p.calls for p in providers.values()), elapsed, cost))
+    return results
+
+
+def run(parallel_groups, args, group_capacity=None):
+    groups, capacity = synthetic_groups(args.groups, args.capacity_unit != 'instance', args.seed)
+    providers = {
+        name: SimulatedProvider(name, args.latency, capacity[name], args.time_scale)
+        for name in ('aws', 'azure')
+    }
+    planner = None
+    if group_capacity == 'oracle':
+        # Estimativa perfeita: a capacidade spot real de cada grupo no simulador.
+        planner = AllocationPlanner(estimator=lambda group: sum(capacity[vm.provider][(vm.region, vm.instance_type)] * vm.weight for vm in group))
+    elif group_capacity:
+        planner = AllocationPlanner(group_capacity=int(group_capacity))
+    service = FleetService(providers, capacity_unit=args.capacity_unit, parallel_groups=parallel_groups, planner=planner)
+    start = time.perf_counter()
+    fleets = service.provision_fleet_multi_cloud(groups, args.nodes, 'lowest-price')
+    elapsed = (time.perf_counter() - start) / args.time_scale
+    vms = [vm for fleet_vms in fleets.values() for vm in fleet_vms]
+    return elapsed, sum(vm.weight for vm in vms), sum(vm.price for vm in vms), sum(p.terminated for p in providers.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara o provisionamento sequencial com o paralelo por grupos usando provedores simulados.")
+    parser.add_argument('--nodes', type=int, default=400, help="Capacidade alvo.")
+    parser.add_argument('--groups', type=int, default=60, help="Quantidade de grupos no catálogo sintético.")
+    parser.add_argument('--parallel-groups', type=int, nargs='+', default=[1, 4, 8, 16], help="Valores de parallel_groups a comparar.")
+    parser.add_argument('--capacity-unit', choices=['instance', 'vcpu'], default='instance')
+    parser.add_argument('--latency', type=float, default=45.0, help="Segundos simulados por create_fleet (criação + waiter).")
+    parser.add_argument('--time-scale', type=float, default=0.002, help="Fração de tempo real por segundo simulado.")
+    parser.add_argument('--group-capacity', default=None, help="Se definido, também roda com o AllocationPlanner estimando esta capacidade por grupo ('oracle' usa a capacidade real simulada).")
+    parser.add_argument('--hedge-after', type=float, default=None, help="Se definido, compara o modo sequencial com e sem hedge (segundos simulados).")
+    parser.add_argument('--hedge-fraction', type=float, default=0.5)
+    parser.add_argument('--tail', type=float, default=0.6, help="Desvio da log-normal da duração de cada create_fleet no modo hedge.")
+    parser.add_argument('--trials', type=int, default=40, help="Rodadas por modo na comparação com hedge.")
+    parser.add_argument('--fulfillment-runs', type=int, default=None, help="Se definido, compara esta quantidade de execuções sequenciais com e sem o FulfillmentRanker.")
+    parser.add_argument('--dry-groups', type=float, default=0.3, help="Com --fulfillment-runs, fração dos grupos sem capacidade spot em todas as execuções.")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    if args.hedge_after is not None:
+        for hedge_after in (None, args.hedge_after):
+            reports = run_hedge_trials(hedge_after, args)
+            times = sorted(r["time_to_capacity_seconds"] for r in reports if r["time_to_capacity_seconds"] is not None)
+            p95 = times[min(len(times) - 1, math.ceil(0.95 * len(times)) - 1)] if times else float('nan')
+            label = f"hedge {hedge_after:.0f}s" if hedge_after is not None else "sem hedge"
+            print(f"{label:<10} | atingiu a meta: {len(times)}/{len(reports)} | tempo até a meta p50: {statistics.median(times):6.1f} s  p95: {p95:6.1f} s | "
+                  f"custo/h: {statistics.mean(r['hourly_cost'] for r in reports):7.3f} (prêmio {statistics.mean(r['hourly_premium'] for r in reports):+.3f}) | "
+                  f"hedges: {statistics.mean(r['hedges'] for r in reports):.1f} | excedente encerrado: {statistics.mean(r['surplus_terminated'] for r in reports):.1f} "
+                  f"({statistics.mean(r['surplus_cost'] for r in reports):.4f} US$)")
+        raise SystemExit(0)
+
+    if args.fulfillment_runs:
+        for ranked in (False, True):
+            results = run_fulfillment_history(ranked, args)
+            label = "histórico" if ranked else "preço"
+            later = results[1:] or results
+            print(f"ordem por {label:<9} | create_fleet por execução: 1ª {results[0][0]:>3}, demais média {statistics.mean(r[0] for r in later):5.1f} | "
+                  f"tempo até a meta médio: {statistics.mean(r[1] for r in later):7.0f} s simulados | custo/h médio: {statistics.mean(r[2] for r in later):8.3f}")
+        raise SystemExit(0)
+
+    runs = [(parallel_groups, None) for parallel_groups in args.parallel_groups]
+    if args.group_capacity:
+        runs += [(parallel_groups, args.group_capacity) for parallel_groups in args.parallel_groups]
+
+    for parallel_groups, group_capacity in runs:
+        elapsed, capacity, cost, terminated = run(parallel_groups, args, group_capacity)
+        mode = f"planner({group_capacity}/grupo)" if group_capacity else "guloso"
+        print(f"{mode:<21} | parallel_groups={parallel_groups:>3} | tempo até a meta: {elapsed:7.0f} s simulados | "
+              f"capacidade: {capacity:>5}/{args.nodes} | custo/h: {cost:8.3f} | excedente encerrado: {terminated}")
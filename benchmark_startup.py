@@ -0,0 +1,53 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Executado em um interpretador novo a cada rodada: importa o main (todos os
+# serviços) e instancia os provedores pedidos, como o início de uma execução real.
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import main
+from app.provider_factory.factory import CloudProviderFactory
+imported = time.perf_counter()
+error = None
+try:
+    providers = {name: CloudProviderFactory.get_provider(name) for name in sys.argv[1:]}
+except ImportError as e:
+    error = str(e)
+ready = time.perf_counter()
+sdks = sorted({name.split('.')[0] for name in sys.modules if name.split('.')[0] in ('boto3', 'botocore', 'azure')})
+print(json.dumps({'import_ms': (imported - start) * 1000, 'providers_ms': (ready - imported) * 1000, 'sdks': sdks, 'error': error}))
+"""
+
+
+def run_once(providers):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD, *providers],
+        capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    return wall_ms, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede o tempo de inicialização do main com cada combinação de provedores.")
+    parser.add_argument('--runs', type=int, default=5, help="Rodadas por combinação (é reportada a mediana).")
+    parser.add_argument('--scenarios', nargs='+', default=['aws', 'azure', 'aws,azure'], help="Combinações de provedores, separadas por vírgula.")
+    args = parser.parse_args()
+
+    for scenario in args.scenarios:
+        providers = [name for name in scenario.split(',') if name]
+        samples = [run_once(providers) for _ in range(args.runs)]
+        last = samples[-1][1]
+
+        print(f"{scenario:<10} | processo: {statistics.median(s[0] for s in samples):7.1f} ms | "
+              f"import main: {statistics.median(s[1]['import_ms'] for s in samples):7.1f} ms | "
+              f"provedores: {statistics.median(s[1]['providers_ms'] for s in samples):7.1f} ms | "
+              f"SDKs carregados: {', '.join(last['sdks']) or 'nenhum'}"
+              + (f" | erro: {last['error']}" if last['error'] else ""))
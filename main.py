@@ -5,13 +5,34 @@ import sys
 
 from app.services.fleet_service import FleetService
 from app.services.catalog_service import CatalogService
+from app.services.cost_ranking import CAPACITY_UNITS
+from app.services.catalog_snapshot import CatalogSnapshotStore
+from app.services.allocation_planner import AllocationPlanner
 from app.provider_factory.factory import CloudProviderFactory
 from app.clients.pricing_client import PricingClient
+from app.clients.async_pricing_client import AsyncPricingClient
+from app.core.catalog import FAMILIES, VENDORS, CompiledCatalog, InstanceFilter
+from app.clients.price_cache import PriceCache
+from app.clients.price_history import PriceHistory
+from app.clients.snapshot_pricing_client import SnapshotPricingClient
+from app.clients.fleet_state import DEFAULT_FLEET_STATE_PATH, FleetStateStore
+from app.clients.fulfillment_stats import DEFAULT_FULFILLMENT_STATS_PATH, FulfillmentStats
+from app.services.fulfillment_ranking import FulfillmentRanker
+from app.core.tracing import tracer
 
 def main(args, catalog_config):
     providers_to_run = args.providers
     location = args.location
     num_vcpus = args.vcpus
+    if args.min_vcpus is not None or args.max_vcpus is not None or args.min_ram or args.family or args.vendor:
+        exact = args.min_vcpus is None and args.max_vcpus is None
+        num_vcpus = InstanceFilter(
+            min_vcpus=args.vcpus if exact else (args.min_vcpus or 0),
+            max_vcpus=args.vcpus if exact else args.max_vcpus,
+            min_ram=args.min_ram * 1024,
+            families=tuple(args.family),
+            vendors=tuple(args.vendor)
+        )
     num_nodes = args.nodes
     allocation_strategy = args.strategy
 
@@ -28,16 +49,74 @@ def main(args, catalog_config):
         name: CloudProviderFactory.get_provider(name)
         for name in providers_to_run
     }
+    fleet_state = FleetStateStore(args.fleet_state) if args.fleet_state else None
+    price_history = price_cache = fulfillment_stats = pricing_client = catalog_service = None
+    try:
+        if args.teardown:
+            if fleet_state is None:
+                raise SystemExit("--teardown precisa do estado local (--fleet-state).")
+            logging.info(f"Desmontando as frotas registradas em '{args.fleet_state}': {fleet_state.accounting()}")
+            FleetService(available_providers, state_store=fleet_state).delete_fleet(include_previous_runs=True)
+            return
 
-    pricing_client = PricingClient()
-    catalog_service = CatalogService(available_providers, pricing_client)
-    fleet_service = FleetService(available_providers)
+        price_history = PriceHistory() if args.price_history or args.rank_by_history else None
+        catalog_snapshots = None
+        if args.pricing_backend == 'snapshot':
+            price_cache = None
+            pricing_client = SnapshotPricingClient(replay=args.replay_prices)
+        else:
+            price_cache = PriceCache(ttl_seconds=args.price_ttl) if args.price_ttl > 0 else None
+            if args.pricing_backend == 'async':
+                pricing_client = AsyncPricingClient(max_concurrency=args.max_concurrency, cache=price_cache, bulk=args.bulk_pricing, history=price_history,
+                                                    max_retries=args.pricing_retries, requests_per_second=args.pricing_rps)
+            else:
+                pricing_client = PricingClient(max_workers=args.max_concurrency, cache=price_cache, bulk=args.bulk_pricing, history=price_history,
+                                               max_retries=args.pricing_retries, requests_per_second=args.pricing_rps)
+            if args.price_ttl > 0 and args.catalog_snapshot:
+                catalog_snapshots = CatalogSnapshotStore(ttl_seconds=args.price_ttl)
+        catalog_service = CatalogService(
+            available_providers, pricing_client,
+            price_history=price_history if args.rank_by_history else None,
+            capacity_unit=args.capacity_unit,
+            max_concurrency=args.max_concurrency,
+            snapshot_store=catalog_snapshots
+        )
+        planner = None
+        if args.plan_allocation:
+            provider_limits = dict((name, int(limit)) for name, limit in (item.split('=', 1) for item in args.provider_limit))
+            planner = AllocationPlanner(args.group_capacity, provider_limits, args.max_group_share)
+        fulfillment_stats = FulfillmentStats(args.fulfillment_stats) if args.fulfillment_stats else None
+        fulfillment = FulfillmentRanker(fulfillment_stats, catalog=catalog_config) if fulfillment_stats else None
+        fleet_service = FleetService(
+            available_providers,
+            capacity_unit=args.capacity_unit,
+            parallel_groups=args.parallel_groups,
+            planner=planner,
+            hedge_after=args.hedge_after,
+            hedge_fraction=args.hedge_fraction,
+            state_store=fleet_state,
+            fulfillment=fulfillment
+        )
 
-    instance_options = catalog_service.build_catalog_in_parallel(catalog_config, num_vcpus, location, 99999)
-    fleet_service.provision_fleet_multi_cloud(instance_options, num_nodes, allocation_strategy)
+        if args.streaming_catalog:
+            instance_options = catalog_service.stream_groups(catalog_config, num_vcpus, location, args.catalog_deadline, args.catalog_limit, args.max_price)
+        else:
+            instance_options = catalog_service.build_catalog_in_parallel(catalog_config, num_vcpus, location, True, args.catalog_limit, args.max_price)
+        fleet_service.provision_fleet_multi_cloud(instance_options, num_nodes, allocation_strategy)
+        # Com --streaming-catalog as cotações só acontecem enquanto os grupos são consumidos.
+        if price_cache is not None:
+            logging.info(f"Estatísticas do cache de preços: {price_cache.stats()}")
+        if fleet_state is not None:
+            logging.info(f"Frota em execução: {fleet_state.accounting()}")
 
-    input("Aperte enter para deletar os fleets...")
-    fleet_service.delete_fleet()
+        input("Aperte enter para deletar os fleets...")
+        fleet_service.delete_fleet()
+    finally:
+        # Também em caso de erro: encerra as cotações em segundo plano antes de
+        # fechar os bancos locais.
+        for resource in (catalog_service, pricing_client, price_cache, price_history, fleet_state, fulfillment_stats):
+            if resource is not None:
+                resource.close()
 
 if __name__ == "__main__":
     logging.basicConfig(filename='./config/logs.log',
@@ -74,15 +153,53 @@ if __name__ == "__main__":
     parser.add_argument(
         '--vcpus',
         type=int,
-        choices=[2, 96],
         default=2,
-        help="Número mínimo de vCPUs desejado para as instâncias da frota."
+        help="Número exato de vCPUs das instâncias da frota (ignorado se --min-vcpus/--max-vcpus forem usados). Padrão: 2"
+    )
+    parser.add_argument(
+        '--min-vcpus',
+        type=int,
+        default=None,
+        help="Aceita instâncias com pelo menos este número de vCPUs."
+    )
+    parser.add_argument(
+        '--max-vcpus',
+        type=int,
+        default=None,
+        help="Aceita instâncias com no máximo este número de vCPUs."
+    )
+    parser.add_argument(
+        '--min-ram',
+        type=int,
+        default=0,
+        help="Memória mínima por instância, em GiB."
+    )
+    parser.add_argument(
+        '--family',
+        nargs='+',
+        choices=FAMILIES,
+        default=[],
+        help=f"Famílias de instância aceitas. Padrão: todas. Opções: {list(FAMILIES)}"
+    )
+    parser.add_argument(
+        '--vendor',
+        nargs='+',
+        choices=VENDORS,
+        default=[],
+        help=f"Fabricantes de CPU aceitos. Padrão: todos. Opções: {list(VENDORS)}"
     )
     parser.add_argument(
         '--nodes',
         type=int,
         required=True,
-        help="Quantidade de nós (VMs) a serem provisionados."
+        help="Quantidade de nós (VMs) a serem provisionados, ou de unidades com --capacity-unit vcpu/memory."
+    )
+    parser.add_argument(
+        '--capacity-unit',
+        type=str,
+        choices=CAPACITY_UNITS,
+        default='instance',
+        help="Unidade da capacidade alvo e do ranking de custo: 'instance' (preço por VM), 'vcpu' (preço por vCPU) ou 'memory' (preço por GiB). Padrão: 'instance'"
     )
     parser.add_argument(
         '--strategy',
@@ -91,12 +208,157 @@ if __name__ == "__main__":
         default='lowest-price',
         help=f"Estratégia de alocação da frota. Padrão: 'lowest-price'. Opções: {STRATEGIES}"
     )
+    parser.add_argument(
+        '--price-ttl',
+        type=int,
+        default=0,
+        help="Liga o cache local de preços com esta validade (em segundos); execuções dentro dela reaproveitam as cotações. Padrão: 0 (sem cache)"
+    )
+    parser.add_argument(
+        '--catalog-snapshot',
+        action='store_true',
+        help="Com --price-ttl, reaproveita o snapshot binário do catálogo salvo por uma execução anterior dentro da validade, sem reconstruí-lo."
+    )
+    parser.add_argument(
+        '--bulk-pricing',
+        action='store_true',
+        help="Cota todos os preços de cada região em uma única requisição paginada."
+    )
+    parser.add_argument(
+        '--streaming-catalog',
+        action='store_true',
+        help="Inicia o provisionamento assim que o grupo mais barato confirmado estiver disponível, sem esperar todas as cotações."
+    )
+    parser.add_argument(
+        '--catalog-deadline',
+        type=float,
+        default=None,
+        help="Com --streaming-catalog, tempo máximo (em segundos) de espera pelos provedores antes de liberar o primeiro grupo."
+    )
+    parser.add_argument(
+        '--rank-by-history',
+        action='store_true',
+        help="Ordena os grupos pelo preço esperado do histórico local de cotações em vez do preço instantâneo (implica --price-history)."
+    )
+    parser.add_argument(
+        '--price-history',
+        action='store_true',
+        help="Grava cada cotação no histórico local (./cache/price_history), usado por --rank-by-history."
+    )
+    parser.add_argument(
+        '--pricing-backend',
+        type=str,
+        choices=['live', 'async', 'snapshot'],
+        default='live',
+        help="Origem dos preços: 'live' (endpoint HTTP com threads), 'async' (endpoint HTTP em um event loop, até --max-concurrency requisições em voo) ou 'snapshot' (csv_results/ e results/, sem rede). Padrão: 'live'"
+    )
+    parser.add_argument(
+        '--replay-prices',
+        action='store_true',
+        help="Com --pricing-backend snapshot, percorre o histórico gravado a cada cotação em vez de usar sempre o preço mais recente."
+    )
+    parser.add_argument(
+        '--max-concurrency',
+        type=int,
+        default=32,
+        help="Orçamento global de concorrência do catálogo: regiões cotadas em paralelo e requisições de preço em voo. Padrão: 32"
+    )
+    parser.add_argument(
+        '--pricing-rps',
+        type=float,
+        default=None,
+        help="Taxa inicial de requisições de preço por segundo, por provedor; cai com 429/5xx e volta a subir sem teto. Padrão: sem limite até o backend pedir para desacelerar."
+    )
+    parser.add_argument(
+        '--pricing-retries',
+        type=int,
+        default=3,
+        help="Retentativas por cotação após 429/5xx ou erro de conexão. Padrão: 3"
+    )
+    parser.add_argument(
+        '--parallel-groups',
+        type=int,
+        default=1,
+        help="Quantos grupos do catálogo provisionar ao mesmo tempo (entre provedores), dividindo a capacidade restante entre eles; o excedente mais caro é encerrado. Padrão: 1 (sequencial)"
+    )
+    parser.add_argument(
+        '--fleet-state',
+        type=str,
+        default=DEFAULT_FLEET_STATE_PATH,
+        help=f"Banco SQLite com as frotas e instâncias provisionadas, usado na desmontagem desta execução e na contabilidade ('' desliga). Padrão: {DEFAULT_FLEET_STATE_PATH}"
+    )
+    parser.add_argument(
+        '--teardown',
+        action='store_true',
+        help="Apenas desmonta todas as frotas ainda ativas no --fleet-state, inclusive as de execuções anteriores (ex.: após uma execução interrompida), e sai."
+    )
+    parser.add_argument(
+        '--fulfillment-stats',
+        type=str,
+        default=None,
+        metavar='ARQUIVO',
+        help=f"Liga o histórico de atendimento por provedor/região/AZ/tipo neste banco SQLite (ex.: {DEFAULT_FULFILLMENT_STATS_PATH}); os grupos passam a ser tentados pelo custo esperado por unidade entregue. Sem ele, a ordem de preço é mantida."
+    )
+    parser.add_argument(
+        '--hedge-after',
+        type=float,
+        default=None,
+        help="Segundos até acionar o próximo grupo se a frota atual não tiver --hedge-fraction da capacidade pronta; o excedente que chegar depois é encerrado. Padrão: sem hedge."
+    )
+    parser.add_argument(
+        '--hedge-fraction',
+        type=float,
+        default=0.5,
+        help="Fração da capacidade pedida que precisa estar pronta em --hedge-after para não acionar o hedge. Padrão: 0.5"
+    )
+    parser.add_argument(
+        '--plan-allocation',
+        action='store_true',
+        help="Divide a capacidade entre os grupos pelo menor custo esperado (AllocationPlanner) em vez de pedir tudo ao grupo mais barato."
+    )
+    parser.add_argument(
+        '--group-capacity',
+        type=int,
+        default=None,
+        help="Com --plan-allocation, capacidade spot estimada por grupo, na unidade de --capacity-unit. Padrão: ilimitada."
+    )
+    parser.add_argument(
+        '--provider-limit',
+        nargs='+',
+        default=[],
+        metavar='PROVEDOR=UNIDADES',
+        help="Com --plan-allocation, teto de capacidade por provedor (ex.: aws=200 azure=100)."
+    )
+    parser.add_argument(
+        '--max-group-share',
+        type=float,
+        default=None,
+        help="Com --plan-allocation, fração máxima da meta pedida a um único grupo (ex.: 0.25)."
+    )
+    parser.add_argument(
+        '--catalog-limit',
+        type=int,
+        default=None,
+        help="Mantém no catálogo apenas as K VMs mais baratas de cada provedor/região. Padrão: todas."
+    )
+    parser.add_argument(
+        '--max-price',
+        type=float,
+        default=None,
+        help="Com --catalog-limit, para de cotar um provedor quando todas as suas regiões já têm K VMs até este preço (por unidade de --capacity-unit)."
+    )
+    parser.add_argument(
+        '--trace',
+        type=str,
+        default=None,
+        metavar='ARQUIVO',
+        help="Grava os spans de cada fase (catálogo, cotação, provisionamento, desmontagem) neste arquivo JSONL. Ver trace_summary.py."
+    )
     
     args = parser.parse_args()
 
     try:
-        with open('./config/vm_catalog.yaml', 'r') as f:
-            catalog_config = yaml.safe_load(f)
+        catalog_config = CompiledCatalog.load('./config/vm_catalog.yaml')
     except FileNotFoundError:
         logging.error("Arquivo de configuração 'config/vm_catalog.yaml' não encontrado. Encerrando.")
         sys.exit(1)
@@ -104,4 +366,9 @@ if __name__ == "__main__":
         logging.error(f"Erro ao processar o arquivo 'config/vm_catalog.yaml': {e}. Encerrando.")
         sys.exit(1)
 
-    main(args, catalog_config)
\ No newline at end of file
+    if args.trace:
+        tracer.configure(args.trace, command='main')
+    try:
+        main(args, catalog_config)
+    finally:
+        tracer.shutdown()
\ No newline at end of file
@@ -7,6 +7,8 @@ import time
 from datetime import datetime
 import concurrent.futures
 import test_runner 
+from app.clients.single_flight import price_flight
+from app.core.tracing import tracer
 
 def find_and_group_tests(all_enabled_tests):
     single_cloud_tests = [tc for tc in all_enabled_tests if tc.get('type') == 'single_cloud']
@@ -40,7 +42,16 @@ def find_and_group_tests(all_enabled_tests):
 
     return parallel_pairs, unmatched_singles, multi_cloud_tests
 
-def main(config_path):
+def main(config_path, trace=True):
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if trace:
+        tracer.configure(f'./results/traces_{timestamp}.jsonl', battery=timestamp)
+    try:
+        run_battery(config_path, timestamp)
+    finally:
+        tracer.shutdown()
+
+def run_battery(config_path, timestamp):
     try:
         with open(config_path, 'r') as f:
             test_config = yaml.safe_load(f)
@@ -64,6 +75,7 @@ def main(config_path):
     logging.info(f"Bateria de testes iniciada: {len(parallel_pairs)} par(es) em paralelo, {len(sequential_singles) + len(sequential_multis)} em sequência.")
     
     tests_processed_count = 0
+    price_flight.reset_stats()
 
     for pair in parallel_pairs:
         if tests_processed_count > 0:
@@ -75,7 +87,7 @@ def main(config_path):
         logging.info(f"--- INICIANDO LOTE PARALELO: '{test_name_a}' e '{test_name_b}' ---")
 
         with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-            future_to_test_case = {executor.submit(test_runner.run_single_test, test_case): test_case for test_case in pair}
+            future_to_test_case = {executor.submit(tracer.bind(test_runner.run_single_test), test_case): test_case for test_case in pair}
             for future in concurrent.futures.as_completed(future_to_test_case):
                 test_case = future_to_test_case[future]
                 test_name = test_case.get('name')
@@ -109,7 +121,9 @@ def main(config_path):
         finally:
             tests_processed_count += 1
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    flight_stats = price_flight.stats()
+    logging.info(f"Cotações de preço na bateria: {flight_stats['calls']} requisições, {flight_stats['deduplicated']} chamadas deduplicadas.")
+
     output_filename = f'./results/test_battery_results_{timestamp}.json'
     
     try:
@@ -145,7 +159,11 @@ if __name__ == "__main__":
         '--config', type=str, default='./config/test_battery_config.yaml',
         help="Caminho para o arquivo de configuração da bateria de testes."
     )
+    parser.add_argument(
+        '--no-trace', action='store_true',
+        help="Não grava os spans de cada fase em ./results/traces_<timestamp>.jsonl."
+    )
     args = parser.parse_args()
 
-    main(args.config)
+    main(args.config, not args.no_trace)
 
@@ -6,20 +6,38 @@ from collections import defaultdict
 
 from app.services.fleet_service import FleetService
 from app.services.catalog_service import CatalogService
+from app.services.catalog_snapshot import CatalogSnapshotStore
+from app.services.allocation_planner import AllocationPlanner
+from app.clients.fleet_state import DEFAULT_FLEET_STATE_PATH, FleetStateStore
+from app.clients.fulfillment_stats import FulfillmentStats
+from app.services.fulfillment_ranking import FulfillmentRanker
 from app.provider_factory.factory import CloudProviderFactory
 from app.clients.pricing_client import PricingClient
+from app.clients.async_pricing_client import AsyncPricingClient
+from app.core.catalog import CompiledCatalog, InstanceFilter
+from app.clients.price_cache import PriceCache
+from app.clients.price_history import PriceHistory
+from app.clients.snapshot_pricing_client import SnapshotPricingClient
+from app.core.tracing import tracer
 
 def run_single_test(test_params: dict):
+    with tracer.span('test', test_name=test_params.get('name'), test_type=test_params.get('type'), providers=test_params.get('providers')) as span:
+        result = _run_single_test(test_params)
+        span.set(status=result.get('status'), provisioning_time_seconds=result.get('provisioning_time_seconds'))
+        return result
+
+def _run_single_test(test_params: dict):
     providers_to_run = test_params.get('providers')
     location = test_params.get('location')
     num_vcpus = test_params.get('vcpus')
+    if test_params.get('instance_filter'):
+        num_vcpus = InstanceFilter.coerce(test_params['instance_filter'])
     num_nodes = test_params.get('nodes')
     allocation_strategy = test_params.get('strategy')
     test_type = test_params.get('type')
 
     try:
-        with open('./config/vm_catalog.yaml', 'r') as f:
-            catalog_config = yaml.safe_load(f)
+        catalog_config = CompiledCatalog.load('./config/vm_catalog.yaml')
     except (FileNotFoundError, yaml.YAMLError) as e:
         logging.error(f"Erro ao carregar 'vm_catalog.yaml': {e}")
         return {
@@ -31,23 +49,69 @@ def run_single_test(test_params: dict):
 
     
     available_providers = {name: CloudProviderFactory.get_provider(name) for name in providers_to_run}
-    pricing_client = PricingClient()
-    catalog_service = CatalogService(available_providers, pricing_client)
-    fleet_service = FleetService(available_providers)
+    # O histórico local só é gravado quando pedido ou quando ordena os grupos.
+    price_history = PriceHistory() if test_params.get('price_history') or test_params.get('rank_by_history') else None
+    max_concurrency = test_params.get('max_concurrency', 32)
+    catalog_snapshots = None
+    if test_params.get('pricing_backend') == 'snapshot':
+        price_cache = None
+        pricing_client = SnapshotPricingClient(replay=test_params.get('replay_prices', False))
+    else:
+        # Cache de preços e snapshot do catálogo são opt-in: sem eles cada teste
+        # da bateria cota e monta o catálogo do zero.
+        price_ttl = test_params.get('price_ttl', 0)
+        price_cache = PriceCache(ttl_seconds=price_ttl) if price_ttl > 0 else None
+        pricing_options = dict(
+            cache=price_cache, bulk=test_params.get('bulk_pricing', False), history=price_history,
+            max_retries=test_params.get('pricing_retries', 3), requests_per_second=test_params.get('pricing_rps')
+        )
+        if test_params.get('pricing_backend') == 'async':
+            pricing_client = AsyncPricingClient(max_concurrency=max_concurrency, **pricing_options)
+        else:
+            pricing_client = PricingClient(max_workers=max_concurrency, **pricing_options)
+        if price_ttl > 0 and test_params.get('catalog_snapshot', False):
+            catalog_snapshots = CatalogSnapshotStore(ttl_seconds=price_ttl)
+    capacity_unit = test_params.get('capacity_unit', 'instance')
+    catalog_service = CatalogService(
+        available_providers, pricing_client,
+        price_history=price_history if test_params.get('rank_by_history') else None,
+        capacity_unit=capacity_unit,
+        max_concurrency=max_concurrency,
+        snapshot_store=catalog_snapshots
+    )
+    fleet_state_path = test_params.get('fleet_state', DEFAULT_FLEET_STATE_PATH)
+    fleet_state = FleetStateStore(fleet_state_path) if fleet_state_path else None
+    # Opt-in, ex.: 'fulfillment_stats': './cache/fulfillment_stats.db'.
+    fulfillment_stats = FulfillmentStats(test_params['fulfillment_stats']) if test_params.get('fulfillment_stats') else None
+    fulfillment = FulfillmentRanker(fulfillment_stats, catalog=catalog_config) if fulfillment_stats else None
+    # 'planner': {'group_capacity': ..., 'provider_limits': {...}, 'max_group_share': ...}
+    planner = AllocationPlanner(**test_params['planner']) if test_params.get('planner') is not None else None
+    fleet_service = FleetService(
+        available_providers,
+        capacity_unit=capacity_unit,
+        parallel_groups=test_params.get('parallel_groups', 1),
+        planner=planner,
+        hedge_after=test_params.get('hedge_after'),
+        hedge_fraction=test_params.get('hedge_fraction', 0.5),
+        state_store=fleet_state,
+        fulfillment=fulfillment
+    )
 
     final_fleets = {}
     all_errors = []
     status = "SUCCESS"
 
     provisioning_time = 0
+    accounting = None
+    teardown_report = None
 
     try:
         logging.info("Construindo catálogo de VMs...")
         is_multicloud_catalog = (test_type == 'multi_cloud')
 
-        limit = 99999
+        limit = test_params.get('catalog_limit')
         
-        instance_options = catalog_service.build_catalog_in_parallel(catalog_config, num_vcpus, location, is_multicloud_catalog, limit)
+        instance_options = catalog_service.build_catalog_in_parallel(catalog_config, num_vcpus, location, is_multicloud_catalog, limit, test_params.get('max_price'))
 
         serializable_price_list = []
         if instance_options:
@@ -71,6 +135,8 @@ def run_single_test(test_params: dict):
             raise ValueError(f"Tipo de teste desconhecido: '{test_type}'")
         end_time = time.time()
         provisioning_time = end_time - start_time
+        if fleet_state is not None:
+            accounting = fleet_state.accounting()
     except Exception as e:
         logging.error(f"Erro durante a execução do teste '{test_params.get('name')}': {e}", exc_info=True)
         all_errors.append(str(e))
@@ -78,8 +144,13 @@ def run_single_test(test_params: dict):
     
     finally:
         logging.info("Iniciando limpeza de recursos (deleção de frotas)...")
-        fleet_service.delete_fleet()
+        teardown_report = fleet_service.delete_fleet()
         logging.info("Limpeza de recursos concluída.")
+        catalog_service.close()
+        pricing_client.close()
+        for store in (price_cache, price_history, fleet_state, fulfillment_stats):
+            if store is not None:
+                store.close()
 
     if all_errors and final_fleets:
         status = "PARTIAL_SUCCESS"
@@ -119,7 +190,11 @@ def run_single_test(test_params: dict):
         "status": status,
         "provisioning_time_seconds": round(provisioning_time, 2),
         "pricing_catalog": serializable_price_list[:10],
+        "pricing_cache": price_cache.stats() if price_cache is not None else None,
         "fleets": processed_fleets,
+        "hedging": fleet_service.last_report,
+        "accounting": accounting,
+        "teardown": teardown_report,
         "errors": all_errors
     }
 
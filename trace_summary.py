@@ -0,0 +1,58 @@
+import argparse
+import glob
+import json
+import math
+from collections import defaultdict
+
+
+def load_spans(paths):
+    spans = []
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            with open(path, encoding='utf-8') as f:
+                spans.extend(json.loads(line) for line in f if line.strip())
+    return spans
+
+
+def percentile(ordered, fraction):
+    # Nearest-rank sobre uma lista já ordenada.
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(spans, by=None, prefix=None):
+    durations = defaultdict(list)
+    errors = defaultdict(int)
+    for span in spans:
+        if prefix and not span['name'].startswith(prefix):
+            continue
+        key = (span['name'], span['attributes'].get(by) if by else None)
+        durations[key].append(span['duration_ms'])
+        if span['status'] == 'ERROR':
+            errors[key] += 1
+
+    rows = []
+    for key, values in durations.items():
+        values.sort()
+        rows.append((key, len(values), errors[key], *(percentile(values, p) for p in (0.5, 0.9, 0.95, 0.99)), values[-1]))
+    return sorted(rows, key=lambda row: (row[0][0], str(row[0][1])))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resume os spans gravados por run_battery.py ou main.py --trace: latência por fase em p50/p90/p95/p99.")
+    parser.add_argument('paths', nargs='+', help="Arquivos JSONL de spans (aceita curingas, ex.: './results/traces_*.jsonl').")
+    parser.add_argument('--by', default=None, metavar='ATRIBUTO', help="Separa cada fase por um atributo do span (ex.: provider, region, mode).")
+    parser.add_argument('--name', default=None, metavar='PREFIXO', help="Mostra apenas spans cujo nome começa com este prefixo (ex.: aws.).")
+    args = parser.parse_args()
+
+    spans = load_spans(args.paths)
+    rows = summarize(spans, args.by, args.name)
+    if not rows:
+        raise SystemExit("Nenhum span encontrado.")
+
+    label = f"fase [{args.by}]" if args.by else "fase"
+    width = max(len(label), *(len(name) + (len(str(value)) + 3 if args.by else 0) for (name, value), *_ in rows))
+    print(f"{label:<{width}} | {'n':>6} | {'erros':>5} | {'p50 ms':>10} | {'p90 ms':>10} | {'p95 ms':>10} | {'p99 ms':>10} | {'máx ms':>10}")
+    for (name, value), count, error_count, p50, p90, p95, p99, maximum in rows:
+        phase = f"{name} [{value}]" if args.by else name
+        print(f"{phase:<{width}} | {count:>6} | {error_count:>5} | {p50:>10.1f} | {p90:>10.1f} | {p95:>10.1f} | {p99:>10.1f} | {maximum:>10.1f}")
+    print(f"{len(spans)} spans em {len({span['trace_id'] for span in spans})} traces.")